@@ -12,6 +12,7 @@ variables are set before running this script.
 Usage:
     Run this script from the command line using the following command:
     python application.py
+    python application.py --profile   # show per-stage latency p50/p95/p99 and log them periodically
 """
 import sys
 from PySide2.QtWidgets import QApplication
@@ -19,6 +20,6 @@ from view.main_window import FatigueStatusApp
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = FatigueStatusApp()
+    window = FatigueStatusApp(profile='--profile' in sys.argv)
     window.show()
     sys.exit(app.exec_())
@@ -6,9 +6,119 @@ File: behavior_detector.py
 
 Description: This module contains the BehaviorDetector class, which uses the YOLOv5 model
 to detect human behaviors from video or image data. The class is responsible for loading the
-model, processing the input data, and identifying behaviors such as walking, running, or other
-activities captured in the visual data.
+model, processing the input data, and identifying behaviors such as using a phone, drinking or
+smoking captured in the visual data.
+
+The model is loaded once with its Conv+BN layers fused and stays resident. Every input is
+letterboxed to the same IMG_SIZE x IMG_SIZE shape, and the Detect grids for that shape are built
+and a warm-up batch is run in load_model(), so the first real frame costs the same as any other.
+Detect runs in candidate mode: objectness is thresholded before the sigmoid and the decode, and
+only the surviving cells go to NMS. With traced=True the model is instead loaded as a TorchScript
+trace for that fixed shape, cached on disk next to the weights (models.experimental.attempt_load_traced).
 
 Classes:
+    BehaviorResult: Behavior detections of one frame.
     BehaviorDetector: Detects human behaviors in visual data using YOLOv5.
-"""
\ No newline at end of file
+"""
+import numpy as np
+
+BEHAVIOR_WEIGHTS = "weight/behavior.pt"
+IMG_SIZE = 640          # fixed square inference size, multiple of the model stride
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+
+
+class BehaviorResult:
+    """Detections of one frame as (label, conf, (x1, y1, x2, y2)) in frame coordinates"""
+
+    def __init__(self, detections):
+        self.detections = detections
+
+    @property
+    def labels(self):
+        return {label for label, _, _ in self.detections}
+
+    def __contains__(self, label):
+        # e.g. 'phone' in result
+        return label in self.labels
+
+
+class BehaviorDetector:
+    """YOLOv5 phone/drinking/smoking detector with a resident, warmed-up model.
+
+    load_model() is called on first use, or explicitly at start-up to pay the loading, the grid
+    construction and the first (slow) forward pass before the camera starts. detect() takes a
+    batch of BGR frames and returns one BehaviorResult per frame.
+    """
+
+    def __init__(self, weights=BEHAVIOR_WEIGHTS, device='', img_size=IMG_SIZE, batch_size=1,
+                 conf_thres=CONF_THRESHOLD, iou_thres=IOU_THRESHOLD, traced=False):
+        self.weights = weights
+        self.device = device
+        self.img_size = img_size
+        self.batch_size = batch_size    # batch size of the warm-up pass, the only one accepted when traced
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.traced = traced
+        self.model = None
+
+    @property
+    def stride(self):
+        return int(self.load_model().stride.max())
+
+    @property
+    def names(self):
+        return self.load_model().names
+
+    def load_model(self):
+        """Load the fused weights once, pre-build the Detect grids and run a warm-up batch"""
+        if self.model is None:
+            import torch
+            from models.experimental import attempt_load, attempt_load_traced
+            from utils.general import check_img_size
+            from utils.torch_utils import select_device
+            self.device = select_device(self.device)
+            if self.traced:
+                # the trace has the grids and the candidate mode baked in, and is loaded from the cache if present
+                model = attempt_load_traced(self.weights, self.img_size, self.batch_size, self.device,
+                                            candidate_thres=self.conf_thres)
+            else:
+                model = attempt_load(self.weights, map_location=self.device, fuse=True)
+                self.img_size = check_img_size(self.img_size, s=int(model.stride.max()))
+
+                # build the grids of the only input shape used, Detect then never rebuilds them in forward()
+                model.model[-1].warmup_grids([(self.img_size, self.img_size)], self.device)
+                model.model[-1].candidate_thres = self.conf_thres  # decode only the cells above conf_thres
+
+            with torch.no_grad():
+                model(torch.zeros(self.batch_size, 3, self.img_size, self.img_size, device=self.device))  # warm up
+            self.model = model
+        return self.model
+
+    def preprocess(self, frame):
+        """(img, ratio, pad) of the letterboxed BGR frame at the fixed inference shape"""
+        from utils.augmentations import letterbox
+        return letterbox(frame, self.img_size, auto=False, stride=self.stride)
+
+    def detect(self, frames, letterboxed=None):
+        """Detect behaviors on a list of BGR frames, returns a list of BehaviorResult.
+
+        letterboxed may pass the preprocess() output of each frame when it was already computed.
+        """
+        import torch
+        from utils.general import candidates_non_max_suppression, scale_coords
+        model = self.load_model()
+        letterboxed = letterboxed or [self.preprocess(frame) for frame in frames]
+        x = np.stack([img[..., ::-1].transpose(2, 0, 1) for img, _, _ in letterboxed], 0)  # BGR HWC to RGB CHW
+        x = torch.from_numpy(np.ascontiguousarray(x)).to(self.device).float() / 255.0
+
+        with torch.no_grad():
+            (candidates, index), _ = model(x)
+        pred = candidates_non_max_suppression(candidates, index, len(x), self.conf_thres, self.iou_thres)
+
+        results = []
+        for frame, (_, ratio, pad), det in zip(frames, letterboxed, pred):
+            det[:, :4] = scale_coords(x.shape[2:], det[:, :4], frame.shape, (ratio, pad)).round()
+            results.append(BehaviorResult([(self.names[int(cls)], conf, tuple(xyxy))
+                                           for *xyxy, conf, cls in det.tolist()]))
+        return results
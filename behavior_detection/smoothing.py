@@ -0,0 +1,83 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: smoothing.py
+
+Description: This module contains the temporal aggregation of the BehaviorDetector output. The
+per-frame confidence of every class goes through an exponential moving average keyed on
+timestamps, and a label only switches on above THRESHOLD_ON and off below THRESHOLD_OFF, so a
+single missed or spurious detection does not make the phone/drinking/smoking labels flicker.
+Because the average depends on elapsed time rather than on frame counts, the detector can run on
+every Nth frame only and the labels are held in between.
+
+Classes:
+    BehaviorState: Smoothed scores and active labels after one update.
+    BehaviorSmoother: EMA with hysteresis over BehaviorResult sequences.
+"""
+import math
+
+TIME_CONSTANT = 0.6     # seconds for the EMA to cover ~63% of a step in confidence
+THRESHOLD_ON = 0.5      # smoothed confidence above which a label becomes active
+THRESHOLD_OFF = 0.3     # smoothed confidence below which an active label is released
+
+
+class BehaviorState:
+    """Smoothed confidence per class and the set of active labels, ``'phone' in state`` works like
+    for a BehaviorResult"""
+
+    def __init__(self, scores, active, result=None):
+        self.scores = scores        # {label: smoothed confidence}
+        self.active = active        # set of labels currently on
+        self.result = result        # raw BehaviorResult of the last update
+
+    @property
+    def labels(self):
+        return self.active
+
+    def __contains__(self, label):
+        return label in self.active
+
+
+class BehaviorSmoother:
+    """Time-based EMA of the per-class confidences with hysteresis thresholds.
+
+    update() takes the BehaviorResult of one inference and its timestamp; frames that were not
+    inferred are simply not fed, the EMA weight of the next result grows with the elapsed time.
+    """
+
+    def __init__(self, time_constant=TIME_CONSTANT, threshold_on=THRESHOLD_ON, threshold_off=THRESHOLD_OFF):
+        assert threshold_off <= threshold_on, 'threshold_off must not exceed threshold_on'
+        self.time_constant = time_constant
+        self.threshold_on = threshold_on
+        self.threshold_off = threshold_off
+        self.reset()
+
+    def reset(self):
+        self.scores = {}
+        self.active = set()
+        self.last_time = None
+        self.state = BehaviorState({}, set())
+
+    def update(self, result, t):
+        # highest confidence of every class on this frame, absent classes count as 0
+        conf = {}
+        for label, c, _ in result.detections:
+            conf[label] = max(conf.get(label, 0.0), c)
+
+        if self.last_time is None:
+            alpha = 1.0
+        else:
+            alpha = 1.0 - math.exp(-max(t - self.last_time, 0.0) / self.time_constant)
+        self.last_time = t
+        for label in set(self.scores) | set(conf):
+            score = self.scores.get(label, 0.0)
+            self.scores[label] = score + alpha * (conf.get(label, 0.0) - score)
+
+        for label, score in self.scores.items():
+            if score >= self.threshold_on:
+                self.active.add(label)
+            elif score < self.threshold_off:
+                self.active.discard(label)
+        self.state = BehaviorState(dict(self.scores), set(self.active), result)
+        return self.state
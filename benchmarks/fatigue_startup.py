@@ -0,0 +1,58 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: fatigue_startup.py
+
+Description: Measures the startup cost of the fatigue pipeline: the import of
+drowsiness_detection.fatigue_detection (run in a fresh interpreter so that nothing is cached)
+and the lazy dlib model loading that now happens in load_models().
+
+Usage:
+    python benchmarks/fatigue_startup.py --runs 5
+"""
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+IMPORT_SNIPPET = ('import time; t = time.perf_counter(); '
+                  'import drowsiness_detection.fatigue_detection; '
+                  'print(time.perf_counter() - t)')
+
+
+def time_import(runs):
+    # import cost in fresh interpreters, seconds
+    times = []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT)
+        times.append(float(out.decode().strip().splitlines()[-1]))
+    return times
+
+
+def time_load_models():
+    # one-off dlib model construction and deserialization, seconds
+    from drowsiness_detection import fatigue_detection
+    t = time.perf_counter()
+    fatigue_detection.load_models()
+    return time.perf_counter() - t
+
+
+def main(opt):
+    times = time_import(opt.runs)
+    print(f'import fatigue_detection: best {min(times) * 1E3:.1f} ms, '
+          f'mean {sum(times) / len(times) * 1E3:.1f} ms over {opt.runs} runs')
+    if opt.load:
+        print(f'load_models() (warm-up): {time_load_models() * 1E3:.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help='number of fresh interpreters to time')
+    parser.add_argument('--load', action='store_true', help='also time the dlib model loading')
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: nms.py
+
+Description: Compares utils.general.non_max_suppression per image (the Python loop over the batch)
+with the batched mode (one NMS call for the whole batch) and with the torch-free NumPy version of
+utils.numpy_nms on random YOLOv5-shaped predictions, checks that all return the same detections and
+prints the mean latency of each.
+
+Usage:
+    python benchmarks/nms.py --batch-size 16 32 --nc 3 --runs 50
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+import torch
+
+from utils import numpy_nms
+from utils.general import non_max_suppression
+
+
+def fake_prediction(bs, nc, img_size=640, seed=0):
+    # (bs, anchors, nc+5) decoded output of a 3-anchor, 3-level Detect() at img_size
+    torch.manual_seed(seed)
+    n = 3 * sum((img_size // s) ** 2 for s in (8, 16, 32))
+    p = torch.rand(bs, n, nc + 5)
+    p[..., :2] *= img_size  # xy
+    p[..., 2:4] = p[..., 2:4] * 120 + 8  # wh
+    p[..., 4] = p[..., 4] ** 200  # most cells are background, ~0.7% above conf 0.25
+    return p
+
+
+def time_nms(fn, pred, runs, **kwargs):
+    # mean seconds per call and the last output, pred is copied since NMS modifies the candidates in place
+    copy = pred.clone if isinstance(pred, torch.Tensor) else pred.copy
+    out = fn(copy(), **kwargs)  # warm up
+    t = time.perf_counter()
+    for _ in range(runs):
+        out = fn(copy(), **kwargs)
+    return (time.perf_counter() - t) / runs, out
+
+
+def same_output(ref, out):
+    return len(ref) == len(out) and all(a.shape == b.shape and torch.allclose(a, torch.as_tensor(b), atol=1e-4)
+                                        for a, b in zip(ref, out))
+
+
+def main(opt):
+    for bs in opt.batch_size:
+        pred = fake_prediction(bs, opt.nc, opt.img_size)
+        kwargs = dict(conf_thres=opt.conf_thres, iou_thres=opt.iou_thres, multi_label=opt.multi_label)
+        t_loop, ref = time_nms(non_max_suppression, pred, opt.runs, **kwargs)
+        t_batch, out = time_nms(non_max_suppression, pred, opt.runs, batched=True, **kwargs)
+        t_np, out_np = time_nms(numpy_nms.non_max_suppression, pred.numpy(), opt.runs, **kwargs)
+        print(f'batch {bs:3d}: per image {t_loop * 1E3:.2f} ms, batched {t_batch * 1E3:.2f} ms '
+              f'({t_loop / t_batch:.1f}x), numpy {t_np * 1E3:.2f} ms, {sum(len(x) for x in ref)} boxes, '
+              f'same output: batched {same_output(ref, out)}, numpy {same_output(ref, out_np)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 16, 32], help='batch sizes to time')
+    parser.add_argument('--nc', type=int, default=3, help='number of classes')
+    parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--conf-thres', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--multi-label', action='store_true', help='multiple labels per box')
+    parser.add_argument('--runs', type=int, default=50, help='timed calls per batch size')
+    main(parser.parse_args())
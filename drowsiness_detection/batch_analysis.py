@@ -0,0 +1,211 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: batch_analysis.py
+
+Description: Offline fatigue analysis of recorded videos. Every video is cut into time segments
+which are processed in parallel by a process pool (one dlib model copy per worker). The workers
+only extract the per-frame EAR/MAR, the fatigue state machine is then replayed in order over the
+whole video, so segment boundaries do not change the result. The output is one columnar .npz file
+per video with the arrays frame, time, face, ear, mar, fatigue and perclos, at the video path
+relative to its source directory mirrored under the output directory.
+
+With --cache the landmarks are also stored in a LandmarkCache; --replay then re-scores the videos
+with new thresholds from that cache only, without decoding a single frame.
+
+Usage:
+    python drowsiness_detection/batch_analysis.py --source videos/ --output runs/fatigue --workers 8
+    python drowsiness_detection/batch_analysis.py --source videos/ --cache runs/landmarks
+    python drowsiness_detection/batch_analysis.py --source videos/ --cache runs/landmarks --replay --threshold-ear 0.22
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # repository root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from drowsiness_detection.fatigue_detection import FACIAL_LANDMARK_PREDICTOR, FatigueDetector, load_models, \
+    replay_fatigue
+from drowsiness_detection.landmark_cache import LandmarkCache
+
+VID_FORMATS = ['mov', 'avi', 'mp4', 'mpg', 'mpeg', 'm4v', 'wmv', 'mkv']  # acceptable video suffixes
+
+
+def find_videos(sources):
+    # (video file, path relative to its source) for files given directly or found recursively in directories
+    files = []
+    for source in sources:
+        p = Path(source)
+        if p.is_dir():
+            files += [(f, f.relative_to(p)) for f in sorted(p.rglob('*')) if f.suffix[1:].lower() in VID_FORMATS]
+        elif p.is_file():
+            files.append((p, Path(p.name)))
+        else:
+            raise FileNotFoundError(f'{source} does not exist')
+    return files
+
+
+def output_files(videos, output):
+    # {video path: <output>/<relative path>.npz}, fails if two videos would write the same file
+    files = {}
+    for video, relative in videos:
+        f = Path(output) / relative.with_suffix('.npz')
+        other = next((v for v, g in files.items() if g == f), None)
+        if other is not None:
+            raise ValueError(f'{video} and {other} would both be saved to {f}')
+        files[str(video)] = f
+    return files
+
+
+def video_info(path):
+    # (number of frames, fps)
+    cap = cv2.VideoCapture(str(path))
+    assert cap.isOpened(), f'Failed to open {path}'
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0  # 30 FPS fallback
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return n, fps
+
+
+def split_video(path, n, fps, segment):
+    # (path, first frame, end frame, fps) tasks of `segment` seconds each
+    step = max(int(segment * fps), 1)
+    return [(str(path), start, min(start + step, n), fps) for start in range(0, n, step)]
+
+
+def init_worker(predictor):
+    cv2.setNumThreads(1)  # one process per core, no nested OpenCV threads
+    load_models(predictor)
+
+
+def analyze_segment(task):
+    """Per-frame EAR/MAR of the primary face for frames [start, end) of a video, landmarks to the cache"""
+    (path, start, end, fps), detector_args, cache = task
+    detector = FatigueDetector(**detector_args)
+    landmarks, valid = cache.open('r+') if cache else (None, None)
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    n = end - start
+    face, ear, mar = np.zeros(n, dtype=bool), np.zeros(n, dtype=np.float32), np.zeros(n, dtype=np.float32)
+    read = 0
+    while read < n:
+        success, frame = cap.read()
+        if not success:
+            break
+        result = detector.detect(frame, timestamp=(start + read) / fps)
+        if result.driver is not None:
+            face[read], ear[read], mar[read] = True, result.ear, result.mar
+            if cache:
+                landmarks[start + read], valid[start + read] = result.driver.landmarks, True
+        read += 1
+    cap.release()
+    if cache:
+        landmarks.flush()
+        valid.flush()
+    return path, start, face[:read], ear[:read], mar[:read]
+
+
+def save_result(f, path, **columns):
+    f.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(f, **columns)
+    fatigue = columns['fatigue']
+    print(f'{path}: {len(fatigue)} frames, fatigue in {fatigue.mean() if len(fatigue) else 0:.1%} -> {f}')
+    return f
+
+
+def replay(source, output='runs/fatigue', cache='runs/landmarks', state_args=None):
+    """Re-score videos from their landmark cache only, returns the list of written files"""
+    videos = find_videos(source if isinstance(source, (list, tuple)) else [source])
+    outputs = output_files(videos, output)
+    files = []
+    for video, _ in videos:
+        c = LandmarkCache.for_video(cache, video)
+        assert c.exists, f'No landmark cache for {video} in {cache}, run without --replay first'
+        files.append(save_result(outputs[str(video)], video, **c.replay(**(state_args or {}))))
+    return files
+
+
+def run(source, output='runs/fatigue', workers=os.cpu_count(), segment=60.0, predictor=FACIAL_LANDMARK_PREDICTOR,
+        detector_args=None, state_args=None, cache=None):
+    """Analyze videos and write <output>/<video path relative to its source>.npz, returns the list of written files.
+
+    cache: optional directory where the landmarks are stored for replay()
+    """
+    detector_args, state_args = detector_args or {}, state_args or {}
+    videos = find_videos(source if isinstance(source, (list, tuple)) else [source])
+    outputs = output_files(videos, output)
+    tasks, frames, fps = [], {}, {}
+    for v, _ in videos:
+        n, fps[str(v)] = video_info(v)
+        frames[str(v)] = n
+        c = LandmarkCache.for_video(cache, v).create(v, n, fps[str(v)]) if cache else None
+        tasks += [(t, detector_args, c) for t in split_video(v, n, fps[str(v)], segment)]
+    print(f'{len(videos)} videos, {len(tasks)} segments of {segment:g}s on {workers} workers')
+
+    parts = {str(v): [] for v, _ in videos}
+    t0 = time.time()
+    with Pool(workers, initializer=init_worker, initargs=(predictor,)) as pool:
+        for i, (path, start, face, ear, mar) in enumerate(pool.imap_unordered(analyze_segment, tasks), 1):
+            parts[path].append((start, face, ear, mar))
+            print(f'\r{i}/{len(tasks)} segments ({time.time() - t0:.1f}s)', end='')
+    print('')
+
+    files = []
+    for path, segments in parts.items():
+        # every segment at its own frame indices, frames a segment could not read keep face=False
+        n = frames[path]
+        face, ear, mar = np.zeros(n, dtype=bool), np.zeros(n, dtype=np.float32), np.zeros(n, dtype=np.float32)
+        for start, f, e, m in segments:
+            end = start + len(f)
+            face[start:end], ear[start:end], mar[start:end] = f, e, m
+        frame = np.arange(n)
+        t = frame / fps[path]
+        fatigue, perclos = replay_fatigue(ear, mar, t, face, **state_args)
+        files.append(save_result(outputs[path], path, frame=frame, time=t, face=face, ear=ear, mar=mar, fatigue=fatigue,
+                                 perclos=perclos))
+    return files
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', nargs='+', required=True, help='video files and/or directories')
+    parser.add_argument('--output', default='runs/fatigue', help='output directory for the .npz files')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--segment', type=float, default=60.0, help='segment length per task (s)')
+    parser.add_argument('--predictor', default=FACIAL_LANDMARK_PREDICTOR, help='dlib 68 landmarks model')
+    parser.add_argument('--cache', default=None, help='landmark cache directory, filled unless --replay')
+    parser.add_argument('--replay', action='store_true', help='re-score from the landmark cache only')
+    parser.add_argument('--detect-scale', type=float, default=None, help='face detection downscale factor')
+    parser.add_argument('--detect-interval', type=int, default=None, help='full face detection every N frames')
+    parser.add_argument('--face-policy', choices=['largest', 'driver'], default=None, help='face to analyze')
+    parser.add_argument('--threshold-ear', type=float, default=None, help='eye closed below this EAR')
+    parser.add_argument('--threshold-mar', type=float, default=None, help='yawn above this MAR')
+    parser.add_argument('--consec-eframes', type=int, default=None, help='frames at REFERENCE_FPS for a blink')
+    parser.add_argument('--consec-mframes', type=int, default=None, help='frames at REFERENCE_FPS for a yawn')
+    return parser.parse_args()
+
+
+def main(opt):
+    detector_args = {k: getattr(opt, k) for k in ('detect_scale', 'detect_interval', 'face_policy')
+                     if getattr(opt, k) is not None}
+    state_args = {k: getattr(opt, k) for k in ('threshold_ear', 'threshold_mar', 'consec_eframes', 'consec_mframes')
+                  if getattr(opt, k) is not None}
+    if opt.replay:
+        assert opt.cache, '--replay requires --cache'
+        replay(opt.source, opt.output, opt.cache, state_args)
+    else:
+        run(opt.source, opt.output, opt.workers, opt.segment, opt.predictor, detector_args, state_args, opt.cache)
+
+
+if __name__ == '__main__':
+    main(parse_opt())
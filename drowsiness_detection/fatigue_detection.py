@@ -10,18 +10,26 @@ is based on the frequency of eye blinks, the duration of eye closures, and other
 of drowsiness.
 
 Classes:
+    FaceResult: Landmarks, EAR and MAR of one detected face.
+    FatigueResult: Per-frame output of FatigueDetector.
+    FatigueState: Blink/yawn counters and PERCLOS of one person.
+    FaceTrack: One face identity followed across frames.
     FatigueDetector: Analyzes video frames to detect fatigue based on facial landmarks.
 
 Refer to:
     https://medium.com/analytics-vidhya/eye-aspect-ratio-ear-and-drowsiness-detector-using-dlib-a0b2c292d706
 """
+import time
+
 import cv2
 import dlib
 import numpy as np
-from scipy.spatial import distance as dist
 # conda install sfe1ed40::imutils
 from imutils import face_utils
 
+from drowsiness_detection.perclos import PerclosEstimator
+from pipeline.profiling import NULL_PROFILER
+
 # some global configuration variables that will be used in the rest of our code
 FACIAL_LANDMARK_PREDICTOR = "weight/shape_predictor_68_face_landmarks.dat"
 # Eyes
@@ -32,23 +40,37 @@ CONSEC_EFRAMES = 2
 THRESHOLD_MAR = 0.5 
 CONSEC_MFRAMES = 3
 
-EYE_COUNTER = 0             # counters for eye blink in every consecutive frame
-EYE_TOTAL = 0               # total number of eye closed
-MOUTH_COUNTER = 0           # counters for yawn in every consecutive frame
-MOUTH_TOTAL = 0             # total number of yawn
+# CONSEC_EFRAMES/CONSEC_MFRAMES are frames at REFERENCE_FPS: every analysed frame counts for the time
+# elapsed since the previous one (at most MAX_FRAME_GAP s), so skipped frames do not shorten closures
+REFERENCE_FPS = 30.0
+MAX_FRAME_GAP = 0.5
 
 # Perclos model to judge fatigue level
-# perclos = (Rolleye/Roll) + (Rollmouth/Roll)*0.2
+# perclos = (closed eye time/window time) + (yawn time/window time)*0.2, over sliding windows in seconds
+PERCLOS_WINDOWS = (10.0, 60.0)  # the first window drives the fatigue flag
+PERCLOS_THRESHOLD = 0.2
+PERCLOS_MIN_COVERAGE = 5.0      # seconds of samples in the first window before the flag may be raised
 
-Roll = 0                    # Total frames inside loop
-Rolleye = 0                 # number of closing eyes inside loop
-Rollmouth = 0               # number of yawns inside loop
+# Face tracking: full HOG detection every DETECT_INTERVAL frames, dlib correlation tracker in between
+DETECT_INTERVAL = 10
+TRACK_QUALITY = 7.0         # peak-to-sidelobe ratio below which the track is considered lost
+# Faces are searched on a copy downscaled by DETECT_SCALE (e.g. 0.5 for 720p, 0.33 for 1080p),
+# landmarks are always fitted on the full resolution frame
+DETECT_SCALE = 1.0
 
-fatigue = False
+# Multiple faces: detections are associated to face tracks by IoU, each track has its own counters.
+# FACE_POLICY 'all' follows every face, 'largest' only the biggest one and 'driver' the face closest
+# to DRIVER_SEAT, the expected face centre as a fraction of the frame (x, y)
+FACE_POLICY = 'largest'
+DRIVER_SEAT = (0.5, 0.5)
+TRACK_IOU = 0.3             # minimum IoU to associate a detection with an existing track
+TRACK_MAX_AGE = 2.0         # seconds a track may go unseen before it is dropped (HOG runs every frame meanwhile)
+DRIVER_MEMORY = 60.0        # seconds the state of a dropped driver track is kept for the re-acquired driver face
+DRIVER_SEAT_RADIUS = 0.25   # 'driver' policy: max distance of the driver face centre to DRIVER_SEAT, frame widths
 
-faceDetector = dlib.get_frontal_face_detector()
-landmarkFinder = dlib.shape_predictor(FACIAL_LANDMARK_PREDICTOR)
-webcamFeed = cv2.VideoCapture(0)
+# dlib models, loaded on first use (see load_models) so that importing this module stays cheap
+faceDetector = None
+landmarkFinder = None
 # point index for eyes
 (leftEyeStart, leftEyeEnd) = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
 (rightEyeStart, rightEyeEnd) = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
@@ -56,11 +78,24 @@ webcamFeed = cv2.VideoCapture(0)
 (mouthStart, mouthEnd) = face_utils.FACIAL_LANDMARKS_IDXS["mouth"]
 
 
+def load_models(predictor=FACIAL_LANDMARK_PREDICTOR):
+    """Load the shared dlib face detector and landmark predictor once.
+
+    Call it explicitly to warm up before the first frame; otherwise the first detect() does it.
+    """
+    global faceDetector, landmarkFinder
+    if faceDetector is None:
+        faceDetector = dlib.get_frontal_face_detector()
+    if landmarkFinder is None:
+        landmarkFinder = dlib.shape_predictor(predictor)
+    return faceDetector, landmarkFinder
+
+
 # Here is the utility function that would return the EAR for a single eye
 def eye_aspect_ratio(eye):
-    p2_minus_p6 = dist.euclidean(eye[1], eye[5])
-    p3_minus_p5 = dist.euclidean(eye[2], eye[4])
-    p1_minus_p4 = dist.euclidean(eye[0], eye[3])
+    p2_minus_p6 = np.linalg.norm(eye[1] - eye[5])
+    p3_minus_p5 = np.linalg.norm(eye[2] - eye[4])
+    p1_minus_p4 = np.linalg.norm(eye[0] - eye[3])
     ear = (p2_minus_p6 + p3_minus_p5) / (2.0 * p1_minus_p4)
     return ear
 
@@ -75,33 +110,394 @@ def mouth_aspect_ratio(mouth):
     return mar
 
 
-def detFatigue(frame):
-    global THRESHOLD_EAR, CONSEC_EFRAMES, THRESHOLD_MAR, CONSEC_MFRAMES, EYE_COUNTER, EYE_TOTAL, MOUTH_COUNTER, \
-        MOUTH_TOTAL, Roll, Rolleye, Rollmouth, fatigue
-
-    # resize to the image and convert it to grayscale.
-    grayImage = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    # Detect all the faces in the image using dlib’s faceDetector
-    faces = faceDetector(grayImage, 0)
-    ear = 0
-    mar = 0
-    for face in faces:
-        faceLandmarks = landmarkFinder(grayImage, face)
-        faceLandmarks = face_utils.shape_to_np(faceLandmarks)
-
-        # eye points extraction
-        leftEye = faceLandmarks[leftEyeStart:leftEyeEnd]
-        rightEye = faceLandmarks[rightEyeStart:rightEyeEnd]
+# landmark index pairs (vertical, vertical, horizontal) used by the EAR and MAR formulas above
+EYE_PAIRS = np.array([[[s + 1, s + 5], [s + 2, s + 4], [s, s + 3]] for s in (leftEyeStart, rightEyeStart)])
+MOUTH_PAIRS = np.array([[mouthStart + 2, mouthStart + 10], [mouthStart + 4, mouthStart + 8],
+                        [mouthStart, mouthStart + 6]])
 
-        leftEAR = eye_aspect_ratio(leftEye)
-        rightEAR = eye_aspect_ratio(rightEye)
 
-        ear = (leftEAR + rightEAR) / 2.0
+def aspect_ratios(landmarks):
+    """Vectorized EAR and MAR for a batch of faces/frames.
 
-        # mouth points extraction
-        mouth = faceLandmarks[mouthStart:mouthEnd]
+    Arguments:
+        landmarks (array[N, 68, 2]): 68-point landmark sets, a single (68, 2) set is also accepted
+    Returns:
+        ear (array[N]): eye aspect ratio averaged over both eyes
+        mar (array[N]): mouth aspect ratio
+    """
+    p = np.asarray(landmarks)
+    p = p.reshape(-1, 68, 2)
+
+    def ratio(pairs):
+        # pairs(..., 3, 2) -> (N, ...) ratio of the two vertical distances over the horizontal one
+        d = p[:, pairs[..., 0]].astype(np.float64) - p[:, pairs[..., 1]]
+        d = np.sqrt((d * d).sum(-1))
+        return (d[..., 0] + d[..., 1]) / (2.0 * d[..., 2])
+
+    return ratio(EYE_PAIRS).mean(1), ratio(MOUTH_PAIRS)
+
+
+def scale_rect(rect, gain):
+    # dlib (d)rectangle -> integer dlib.rectangle with its coordinates multiplied by gain
+    return dlib.rectangle(int(round(rect.left() * gain)), int(round(rect.top() * gain)),
+                          int(round(rect.right() * gain)), int(round(rect.bottom() * gain)))
+
+
+def rect_iou(a, b):
+    # intersection over union of two dlib rectangles
+    w = min(a.right(), b.right()) - max(a.left(), b.left())
+    h = min(a.bottom(), b.bottom()) - max(a.top(), b.top())
+    inter = max(w, 0) * max(h, 0)
+    union = a.width() * a.height() + b.width() * b.height() - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceResult:
+    """Detection output for one face: track id, dlib rectangle, (68, 2) landmarks, EAR, MAR and fatigue"""
+
+    def __init__(self, track_id, rect, landmarks, ear, mar, fatigue):
+        self.track_id = track_id
+        self.rect = rect
+        self.landmarks = landmarks
+        self.ear = ear
+        self.mar = mar
+        self.fatigue = fatigue
+
+
+class FatigueResult:
+    """Detection output for one frame, drawing is left to draw_fatigue()"""
+
+    def __init__(self, faces, fatigue, perclos, driver_id=None):
+        self.faces = faces          # list of FaceResult, the primary (driver) face last when it is visible
+        self.fatigue = fatigue      # fatigue flag of the primary face after this frame
+        self.perclos = perclos      # {window length (s): perclos} of the primary face
+        self.driver_id = driver_id  # track id of the primary face, also while it is missing
+
+    @property
+    def driver(self):
+        # FaceResult of the primary face, None when it was not found on this frame
+        if self.faces and self.faces[-1].track_id == self.driver_id:
+            return self.faces[-1]
+        return None
+
+    @property
+    def ear(self):
+        # EAR/MAR of the primary face, 0 when it was not found (as returned by detFatigue)
+        return self.driver.ear if self.driver else 0
+
+    @property
+    def mar(self):
+        return self.driver.mar if self.driver else 0
+
+
+class FatigueState:
+    """Blink/yawn counters and PERCLOS windows of one person, fed with per-frame EAR and MAR.
+
+    The counters and the PERCLOS windows accumulate seconds rather than frames, so they give the
+    same blinks, yawns and PERCLOS whether every frame is analysed or the detector skips frames it
+    cannot afford.
+    """
+
+    def __init__(self, threshold_ear=THRESHOLD_EAR, consec_eframes=CONSEC_EFRAMES,
+                 threshold_mar=THRESHOLD_MAR, consec_mframes=CONSEC_MFRAMES,
+                 perclos_windows=PERCLOS_WINDOWS, perclos_threshold=PERCLOS_THRESHOLD,
+                 perclos_min_coverage=PERCLOS_MIN_COVERAGE):
+        self.threshold_ear = threshold_ear
+        self.consec_eframes = consec_eframes
+        self.threshold_mar = threshold_mar
+        self.consec_mframes = consec_mframes
+        self.perclos = PerclosEstimator(perclos_windows, perclos_threshold, perclos_min_coverage)
+        self.reset()
+
+    def reset(self):
+        self.eye_counter = 0        # seconds of eye closure since the last blink
+        self.eye_total = 0          # total number of eye closed
+        self.mouth_counter = 0      # seconds of open mouth since the last yawn
+        self.mouth_total = 0        # total number of yawn
+        self.last_time = None       # timestamp of the previous sample
+        self.perclos.reset()
+
+    @property
+    def fatigue(self):
+        return self.perclos.fatigue
+
+    def update(self, ear, mar, t):
+        eye_closed = ear < self.threshold_ear
+        mouth_open = mar > self.threshold_mar
+        # duration this sample stands for, one reference frame for the first one
+        dt = 1 / REFERENCE_FPS if self.last_time is None else min(max(t - self.last_time, 0.0), MAX_FRAME_GAP)
+        self.last_time = t
+        if eye_closed:
+            self.eye_counter += dt
+        else:
+            if self.eye_counter >= self.consec_eframes / REFERENCE_FPS - 1e-6:
+                self.eye_total += 1
+                self.eye_counter = 0
+
+        if mouth_open:
+            self.mouth_counter += dt
+        else:
+            if self.mouth_counter >= self.consec_mframes / REFERENCE_FPS - 1e-6:
+                self.mouth_total += 1
+                self.mouth_counter = 0
+
+        return self.perclos.update(t, eye_closed, mouth_open, dt)
+
+
+class FaceTrack:
+    """One face identity across frames: last box, correlation tracker and its own FatigueState"""
+
+    def __init__(self, track_id, rect, state):
+        self.track_id = track_id
+        self.rect = rect            # last known box, full resolution coordinates
+        self.state = state
+        self.tracker = None         # dlib.correlation_tracker, working on the downscaled image
+        self.last_seen = None       # timestamp of the last frame the face was detected or tracked in
+
+    @property
+    def area(self):
+        return self.rect.width() * self.rect.height()
 
-        mar = mouth_aspect_ratio(mouth=mouth)
+
+class FatigueDetector:
+    """Per-session fatigue state on top of the shared dlib models.
+
+    Every instance keeps its own face tracks, each with its own blink/yawn counters and PERCLOS
+    windows, so one process can monitor several cameras while ``faceDetector`` and ``landmarkFinder``
+    are loaded only once, and a passenger in view does not disturb the driver's counts.
+
+    The sliding-window HOG detector only runs every ``detect_interval`` frames, or as soon as a
+    tracked face is lost; in between the faces are followed with dlib correlation trackers, which
+    only search a small region around the previous box. ``detect_interval=1`` detects every frame.
+    Detections are associated with the existing tracks by IoU. ``face_policy`` selects which faces
+    are tracked at all ('all', 'largest' or 'driver'), the others cost no tracking nor landmarks.
+
+    Detection and tracking run on a copy of the frame downscaled by ``detect_scale``; the face boxes
+    are mapped back so the 68-point shape predictor still fits the full resolution image.
+
+    ``profiler`` (pipeline.profiling.Profiler) times the 'hog', 'track' and 'landmarks' steps.
+    """
+
+    def __init__(self, threshold_ear=THRESHOLD_EAR, consec_eframes=CONSEC_EFRAMES,
+                 threshold_mar=THRESHOLD_MAR, consec_mframes=CONSEC_MFRAMES,
+                 perclos_windows=PERCLOS_WINDOWS, perclos_threshold=PERCLOS_THRESHOLD,
+                 perclos_min_coverage=PERCLOS_MIN_COVERAGE, detect_interval=DETECT_INTERVAL, track_quality=TRACK_QUALITY, detect_scale=DETECT_SCALE,
+                 face_policy=FACE_POLICY, driver_seat=DRIVER_SEAT, profiler=None):
+        assert face_policy in ('all', 'largest', 'driver'), f'Invalid face_policy {face_policy}'
+        self.state_args = dict(threshold_ear=threshold_ear, consec_eframes=consec_eframes,
+                               threshold_mar=threshold_mar, consec_mframes=consec_mframes,
+                               perclos_windows=perclos_windows, perclos_threshold=perclos_threshold,
+                               perclos_min_coverage=perclos_min_coverage)
+        self.detect_interval = detect_interval
+        self.track_quality = track_quality
+        self.detect_scale = detect_scale
+        self.face_policy = face_policy
+        self.driver_seat = driver_seat
+        self.profiler = profiler or NULL_PROFILER
+        self.reset()
+
+    def reset(self):
+        """Forget all faces and their counters, e.g. when the driver changes"""
+        self.tracks = []            # FaceTrack list
+        self.next_id = 0
+        self.primary = None         # FaceTrack of the driver, drives the session fatigue flag
+        self.lost_primary = None    # dropped driver track, its state is resumed when the driver face comes back
+        self.frames_since_detect = 0
+
+    @property
+    def driver(self):
+        # driver track, or the dropped one while its face is missing, its flag is held meanwhile
+        return self.primary or self.lost_primary
+
+    @property
+    def fatigue(self):
+        return self.driver.state.fatigue if self.driver else False
+
+    def pick_primary(self, faces, shape):
+        """The driver among full resolution boxes: closest to driver_seat for the 'driver' policy,
+        the largest otherwise. shape is the frame (height, width)"""
+        if self.face_policy == 'driver':
+            x, y = self.driver_seat[0] * shape[1], self.driver_seat[1] * shape[0]
+            return min(faces, key=lambda r: (r.center().x - x) ** 2 + (r.center().y - y) ** 2)
+        return max(faces, key=lambda r: r.width() * r.height())
+
+    def near_driver(self, face, track, shape):
+        """Whether a new box may be the missing driver: centre within one box width of the driver's
+        last box, and for the 'driver' policy within DRIVER_SEAT_RADIUS of the driver seat"""
+        c, last = face.center(), track.rect.center()
+        if (c.x - last.x) ** 2 + (c.y - last.y) ** 2 > track.rect.width() ** 2:
+            return False
+        if self.face_policy == 'driver':
+            x, y = self.driver_seat[0] * shape[1], self.driver_seat[1] * shape[0]
+            return (c.x - x) ** 2 + (c.y - y) ** 2 <= (DRIVER_SEAT_RADIUS * shape[1]) ** 2
+        return True
+
+    def select_faces(self, faces, shape):
+        # apply face_policy to the detections
+        if self.face_policy == 'all' or len(faces) < 2:
+            return list(faces)
+        return [self.pick_primary(faces, shape)]
+
+    def associate(self, faces, t, shape):
+        """Greedy IoU matching of new detections with the tracks, returns the tracks seen this frame.
+
+        Tracks unseen for more than TRACK_MAX_AGE seconds are dropped. When the driver track is dropped
+        its state is kept for DRIVER_MEMORY seconds. While the driver is missing, the unmatched face
+        closest to the driver's last box resumes the driver track with its id and counters, if
+        near_driver() accepts it.
+        """
+        pairs = sorted(((rect_iou(track.rect, face), ti, fi) for ti, track in enumerate(self.tracks)
+                        for fi, face in enumerate(faces)), reverse=True)
+        matched, used_tracks, used_faces = [], set(), set()
+        for iou, ti, fi in pairs:
+            if iou < TRACK_IOU:
+                break
+            if ti in used_tracks or fi in used_faces:
+                continue
+            used_tracks.add(ti)
+            used_faces.add(fi)
+            track = self.tracks[ti]
+            track.rect, track.last_seen = faces[fi], t
+            matched.append(track)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.tracker = None
+        self.tracks = [track for track in self.tracks if t - track.last_seen <= TRACK_MAX_AGE]
+        if self.primary is not None and self.primary not in self.tracks:
+            self.lost_primary, self.primary = self.primary, None  # the driver has been gone for too long
+        if self.lost_primary is not None and t - self.lost_primary.last_seen > DRIVER_MEMORY:
+            self.lost_primary = None
+
+        # a driver track not matched by IoU (e.g. after a head movement) or dropped, that a new face close to its
+        # last box resumes; any other new face is a new identity and never takes over the driver's counters
+        missing = self.primary if self.primary is not None and self.primary not in matched else self.lost_primary
+        new = [fi for fi in range(len(faces)) if fi not in used_faces]
+        near = [fi for fi in new if missing is not None and self.near_driver(faces[fi], missing, shape)]
+        driver = min(near, key=lambda fi: (faces[fi].center().x - missing.rect.center().x) ** 2 +
+                     (faces[fi].center().y - missing.rect.center().y) ** 2) if near else None
+        for fi in new:
+            if fi == driver:  # the driver is back, resume the counters
+                track = missing
+                if track is self.lost_primary:
+                    self.lost_primary, self.primary = None, track
+                    self.tracks.append(track)
+                track.rect = faces[fi]
+            else:  # new identity
+                track = FaceTrack(self.next_id, faces[fi], FatigueState(**self.state_args))
+                self.next_id += 1
+                self.tracks.append(track)
+            track.last_seen = t
+            matched.append(track)
+        return matched
+
+    def find_faces(self, grayImage, t):
+        """Return the tracks visible in this frame at time t, from full detection or from the trackers"""
+        faceDetector, _ = load_models()
+        scale = self.detect_scale
+        small = grayImage
+        if scale != 1.0:
+            small = cv2.resize(grayImage, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        tracked = [track for track in self.tracks if track.tracker is not None]
+        if tracked and self.frames_since_detect < self.detect_interval:
+            with self.profiler.time('track'):
+                lost = False
+                for track in tracked:
+                    if track.tracker.update(small) < self.track_quality:
+                        lost = True  # track lost, fall back to a full detection
+                        break
+                    track.rect = scale_rect(track.tracker.get_position(), 1 / scale)
+            if not lost:
+                for track in tracked:
+                    track.last_seen = t
+                self.frames_since_detect += 1
+                return tracked
+
+        # Detect all the faces in the image using dlib’s faceDetector
+        with self.profiler.time('hog'):
+            faces = [scale_rect(face, 1 / scale) for face in faceDetector(small, 0)]
+        visible = self.associate(self.select_faces(faces, grayImage.shape[:2]), t, grayImage.shape[:2])
+        for track in visible:
+            track.tracker = None
+            if self.detect_interval > 1:
+                track.tracker = dlib.correlation_tracker()
+                track.tracker.start_track(small, scale_rect(track.rect, scale))
+        self.frames_since_detect = 1
+        return visible
+
+    def detect(self, frame, timestamp=None, grayImage=None):
+        """Update the session with one BGR frame and return a FatigueResult, frame is not modified.
+
+        timestamp (s) defaults to time.monotonic(), grayImage may pass an already converted frame
+        """
+        t = time.monotonic() if timestamp is None else timestamp
+        _, landmarkFinder = load_models()
+
+        # resize to the image and convert it to grayscale.
+        if grayImage is None:
+            grayImage = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        visible = self.find_faces(grayImage, t)
+        if not visible:
+            return FatigueResult([], self.fatigue, self.driver.state.perclos.values if self.driver else {},
+                                 self.driver.track_id if self.driver else None)
+
+        # primary face: chosen once (the only one, the largest, or the one closest to the driver seat) and kept
+        # while its track is alive or remembered, another face never takes over while the driver is missing
+        if self.driver is None:
+            rects = [track.rect for track in visible]
+            self.primary = visible[rects.index(self.pick_primary(rects, grayImage.shape[:2]))]
+        visible.sort(key=lambda track: track is self.primary)  # primary last
+
+        with self.profiler.time('landmarks'):
+            landmarks = np.stack([face_utils.shape_to_np(landmarkFinder(grayImage, track.rect)) for track in visible])
+        ears, mars = aspect_ratios(landmarks)
+        results = []
+        for track, faceLandmarks, ear, mar in zip(visible, landmarks, ears.tolist(), mars.tolist()):
+            fatigue = track.state.update(ear, mar, t)
+            results.append(FaceResult(track.track_id, track.rect, faceLandmarks, ear, mar, fatigue))
+        return FatigueResult(results, self.fatigue, self.driver.state.perclos.values, self.driver.track_id)
+
+
+def replay_fatigue(ear, mar, timestamps, valid=None, **kwargs):
+    """Run the fatigue state machine over stored per-frame EAR/MAR of one person.
+
+    Arguments:
+        ear, mar, timestamps (array[N]): per-frame values, timestamps in seconds
+        valid (array[N] of bool): frames where a face was found, others leave the state untouched
+        kwargs: FatigueState thresholds
+    Returns:
+        fatigue (array[N] of bool), perclos (array[N, len(perclos_windows)])
+    """
+    state = FatigueState(**kwargs)
+    n = len(ear)
+    valid = np.ones(n, dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+    fatigue = np.zeros(n, dtype=bool)
+    perclos = np.zeros((n, len(state.perclos.windows)), dtype=np.float32)
+    f, p = False, [0.0] * len(state.perclos.windows)
+    for i, (e, m, t, v) in enumerate(zip(np.asarray(ear).tolist(), np.asarray(mar).tolist(),
+                                          np.asarray(timestamps).tolist(), valid.tolist())):
+        if v:
+            f = state.update(e, m, t)
+            p = [w.value for w in state.perclos.windows]
+        fatigue[i] = f
+        perclos[i] = p
+    return fatigue, perclos
+
+
+def draw_fatigue(frame, result, gain=None):
+    """Draw the eye/mouth hulls and the EAR/MAR lines of a FatigueResult onto frame, in place.
+
+    gain (gx, gy) scales the landmarks when frame is a resized copy of the detected one
+    """
+    for face in result.faces:
+        faceLandmarks = face.landmarks
+        if gain is not None:
+            faceLandmarks = (faceLandmarks * gain).astype(int)
+        # eye and mouth points extraction
+        leftEye = faceLandmarks[leftEyeStart:leftEyeEnd]
+        rightEye = faceLandmarks[rightEyeStart:rightEyeEnd]
+        mouth = faceLandmarks[mouthStart:mouthEnd]
 
         # use cv2.convexHull to get the convex hull of a set of points
         leftEyeHull = cv2.convexHull(leftEye)
@@ -117,44 +513,15 @@ def detFatigue(frame):
         cv2.line(frame, tuple(faceLandmarks[43]), tuple(faceLandmarks[47]), (0, 255, 0), 1)
         cv2.line(frame, tuple(faceLandmarks[51]), tuple(faceLandmarks[57]), (0, 255, 0), 1)
         cv2.line(frame, tuple(faceLandmarks[48]), tuple(faceLandmarks[54]), (0, 255, 0), 1)
+    return frame
 
-        # if ear < MINIMUM_EAR:
-        #     EYE_CLOSED_COUNTER += 1
-        # # else:
-        # #     EYE_CLOSED_COUNTER = 0
-        # #     FATIGUE = False
-        # # if EYE_CLOSED_COUNTER >= MAXIMUM_FRAME_COUNT:
-        # #     FATIGUE = True
-
-        if ear < THRESHOLD_EAR:
-            EYE_COUNTER += 1
-            Rolleye += 1
-        else:
 
-            if EYE_COUNTER >= CONSEC_EFRAMES:
-                EYE_TOTAL += 1
-                EYE_COUNTER = 0
-        
-        if mar > THRESHOLD_MAR:
-            MOUTH_COUNTER += 1
-            Rollmouth += 1
-        else:
-            if MOUTH_COUNTER >= CONSEC_MFRAMES:
-                MOUTH_TOTAL += 1
-                MOUTH_COUNTER = 0
-        
-        Roll += 1
-
-        if Roll == 150:
-            perclos = (Rolleye/Roll) + (Rollmouth/Roll)*0.2
-            if perclos > 0.2:  # eyes + mouth？
-                fatigue = True
-            else:
-                fatigue = False
-            Roll = 0
-            Rollmouth = 0
-            Rolleye = 0
-            # set labels
-        else:
-            pass
-    return frame, ear, mar, fatigue
+# default session used by detFatigue() for the single-camera GUI
+_detector = FatigueDetector()
+
+
+def detFatigue(frame):
+    result = _detector.detect(frame)
+    with _detector.profiler.time('draw'):
+        draw_fatigue(frame, result)
+    return frame, result.ear, result.mar, result.fatigue
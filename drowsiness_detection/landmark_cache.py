@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: landmark_cache.py
+
+Description: This module stores the per-frame 68-point landmarks of the primary face of a video
+in memory-mapped .npy files, keyed by a hash of the video file and indexed by frame number. Once a
+video has gone through dlib, the fatigue thresholds (THRESHOLD_EAR, THRESHOLD_MAR, CONSEC_EFRAMES,
+CONSEC_MFRAMES, PERCLOS) can be re-tuned by replaying the state machine over the cache only.
+
+Classes:
+    LandmarkCache: Memory-mapped landmark store of one video.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from drowsiness_detection.fatigue_detection import aspect_ratios, replay_fatigue
+
+
+def video_hash(path, block=1 << 20):
+    # sha1 of the file size, first and last MB: cheap on multi-GB recordings, changes with any re-encode
+    size = os.path.getsize(path)
+    h = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(block))
+        if size > block:
+            f.seek(max(size - block, block))
+            h.update(f.read(block))
+    return h.hexdigest()
+
+
+class LandmarkCache:
+    """Landmarks (n, 68, 2) int16 and a face-found mask (n,) of one video under ``cache_dir``.
+
+    The files are written in place through np.memmap, so the workers of the batch analysis can each
+    fill their own frame range of the same cache.
+    """
+
+    def __init__(self, cache_dir, key):
+        self.key = key
+        root = Path(cache_dir)
+        self.landmarks_file = root / f'{key}.landmarks.npy'
+        self.valid_file = root / f'{key}.valid.npy'
+        self.meta_file = root / f'{key}.json'
+
+    @classmethod
+    def for_video(cls, cache_dir, video):
+        return cls(cache_dir, video_hash(video))
+
+    @property
+    def exists(self):
+        return self.meta_file.exists() and self.landmarks_file.exists() and self.valid_file.exists()
+
+    @property
+    def meta(self):
+        with open(self.meta_file) as f:
+            return json.load(f)  # {'source', 'frames', 'fps'}
+
+    def create(self, source, n, fps):
+        """Allocate empty files for n frames"""
+        self.meta_file.parent.mkdir(parents=True, exist_ok=True)
+        np.lib.format.open_memmap(self.landmarks_file, mode='w+', dtype=np.int16, shape=(n, 68, 2)).flush()
+        np.lib.format.open_memmap(self.valid_file, mode='w+', dtype=bool, shape=(n,)).flush()
+        with open(self.meta_file, 'w') as f:
+            json.dump({'source': str(source), 'frames': n, 'fps': fps}, f)
+        return self
+
+    def open(self, mode='r'):
+        """(landmarks, valid) memmaps, mode 'r' to read or 'r+' to fill in"""
+        return np.load(self.landmarks_file, mmap_mode=mode), np.load(self.valid_file, mmap_mode=mode)
+
+    def aspect_ratios(self, chunk=1 << 16):
+        """EAR and MAR of every cached frame, computed in chunks to bound memory"""
+        landmarks, valid = self.open()
+        ear, mar = np.zeros(len(valid), dtype=np.float32), np.zeros(len(valid), dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):  # frames without face have all-zero landmarks
+            for i in range(0, len(valid), chunk):
+                ear[i:i + chunk], mar[i:i + chunk] = aspect_ratios(landmarks[i:i + chunk])
+        valid = np.asarray(valid)
+        ear[~valid], mar[~valid] = 0, 0
+        return ear, mar, valid
+
+    def replay(self, **kwargs):
+        """Re-evaluate the fatigue state machine from the cache with new FatigueState thresholds.
+
+        Returns:
+            dict of per-frame arrays frame, time, face, ear, mar, fatigue, perclos
+        """
+        ear, mar, valid = self.aspect_ratios()
+        frame = np.arange(len(valid))
+        t = frame / self.meta['fps']
+        fatigue, perclos = replay_fatigue(ear, mar, t, valid, **kwargs)
+        return dict(frame=frame, time=t, face=valid, ear=ear, mar=mar, fatigue=fatigue, perclos=perclos)
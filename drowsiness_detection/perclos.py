@@ -0,0 +1,93 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: perclos.py
+
+Description: This module contains the sliding-window PERCLOS (percentage of eyelid closure)
+estimator used by the fatigue detector. Samples are keyed on timestamps instead of frame
+counts, so a window always covers the same time span whatever the frame rate, and the
+estimate is refreshed on every frame instead of once per 150-frame loop. Each sample weighs
+the time it stands for, so PERCLOS stays a ratio of durations when the inference rate varies.
+
+Classes:
+    PerclosWindow: Running PERCLOS over the last N seconds.
+    PerclosEstimator: Several PerclosWindow of different lengths fed with the same samples.
+"""
+from collections import deque
+
+# perclos = closed eye time ratio + yawn time ratio * MOUTH_WEIGHT
+MOUTH_WEIGHT = 0.2
+
+
+class PerclosWindow:
+    """PERCLOS over the last ``length`` seconds.
+
+    The samples sit in a FIFO ring buffer with running sums of the closed-eye, yawn and total time,
+    so each update is amortized O(1): one append plus the evictions of samples that left the window.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.reset()
+
+    def reset(self):
+        self.samples = deque()  # (timestamp, duration, eye_closed, mouth_open)
+        self.eye = 0.0          # seconds of closing eyes inside the window
+        self.mouth = 0.0        # seconds of yawn inside the window
+        self.total = 0.0        # seconds covered by the samples inside the window
+
+    def update(self, t, eye_closed, mouth_open, dt):
+        # dt: seconds the sample stands for, i.e. since the previous analysed frame
+        self.samples.append((t, dt, eye_closed, mouth_open))
+        self.eye += dt * eye_closed
+        self.mouth += dt * mouth_open
+        self.total += dt
+        while self.samples[0][0] <= t - self.length:  # drop samples older than the window
+            _, d, e, m = self.samples.popleft()
+            self.eye -= d * e
+            self.mouth -= d * m
+            self.total -= d
+        return self.value
+
+    @property
+    def value(self):
+        total = self.total
+        return (self.eye / total) + (self.mouth / total) * MOUTH_WEIGHT if total > 0 else 0.0
+
+    @property
+    def coverage(self):
+        # seconds covered by the samples inside the window
+        return self.total
+
+
+class PerclosEstimator:
+    """Feeds the same eye/mouth samples to windows of several lengths, e.g. 10 s and 60 s.
+
+    The fatigue flag follows the first (primary) window and is re-evaluated on every sample, as soon
+    as that window covers ``min_coverage`` seconds (5 s, the 150 frames of the original loop), or the
+    whole window when it is shorter.
+    """
+
+    def __init__(self, windows=(10.0, 60.0), threshold=0.2, min_coverage=5.0):
+        self.windows = [PerclosWindow(length) for length in windows]
+        self.threshold = threshold
+        self.min_coverage = min(min_coverage, self.windows[0].length)
+        self.fatigue = False
+
+    def reset(self):
+        for w in self.windows:
+            w.reset()
+        self.fatigue = False
+
+    def update(self, t, eye_closed, mouth_open, dt):
+        for w in self.windows:
+            w.update(t, eye_closed, mouth_open, dt)
+        primary = self.windows[0]
+        self.fatigue = primary.coverage >= self.min_coverage - 1e-6 and primary.value > self.threshold
+        return self.fatigue
+
+    @property
+    def values(self):
+        # {window length (s): perclos}
+        return {w.length: w.value for w in self.windows}
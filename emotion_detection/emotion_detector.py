@@ -8,6 +8,96 @@ Description: This module contains the EmotionDetector class, which utilizes the
 to detect emotions from images. The class handles loading the model, processing images, and
 interpreting the results to categorize emotions such as happy, sad, angry, or surprised.
 
+The model does not look at the whole frame: the fatigue stage has already found the faces with
+dlib, so only a crop around each face is letterboxed to a small CROP_SIZE input (160 instead of
+640, about 16x fewer pixels) and all the crops of a frame go through the network as one batch.
+
 Classes:
+    EmotionResult: Emotion of one face.
     EmotionDetector: Detects emotions in images using YOLOv5.
-"""
\ No newline at end of file
+"""
+import numpy as np
+
+EMOTION_WEIGHTS = "weight/emotion.pt"
+CROP_SIZE = 160         # inference size of a face crop, multiple of the model stride
+CROP_MARGIN = 0.25      # the dlib box is grown by this fraction of its size on each side
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+
+
+def crop_box(rect, shape, margin=CROP_MARGIN):
+    """Integer (x1, y1, x2, y2) of a dlib rectangle grown by margin and clipped to the frame (h, w)"""
+    w, h = rect.right() - rect.left(), rect.bottom() - rect.top()
+    x1 = max(int(rect.left() - w * margin), 0)
+    y1 = max(int(rect.top() - h * margin), 0)
+    x2 = min(int(rect.right() + w * margin), shape[1])
+    y2 = min(int(rect.bottom() + h * margin), shape[0])
+    return x1, y1, x2, y2
+
+
+class EmotionResult:
+    """Emotion of one face: track id, label, confidence and the detected box in frame coordinates"""
+
+    def __init__(self, track_id, label, conf, box):
+        self.track_id = track_id
+        self.label = label          # class name, None when nothing was detected in the crop
+        self.conf = conf
+        self.box = box              # (x1, y1, x2, y2) or None
+
+
+class EmotionDetector:
+    """YOLOv5 emotion classifier on the face boxes of the fatigue stage.
+
+    The weights are loaded through models.experimental.attempt_load and wrapped in AutoShape on
+    first use (see load_model), so creating a detector stays cheap. detect() takes the BGR frame and
+    the faces found on it (FaceResult or dlib rectangles) and returns one EmotionResult per face.
+    """
+
+    def __init__(self, weights=EMOTION_WEIGHTS, device='', crop_size=CROP_SIZE, margin=CROP_MARGIN,
+                 conf_thres=CONF_THRESHOLD, iou_thres=IOU_THRESHOLD):
+        self.weights = weights
+        self.device = device
+        self.crop_size = crop_size
+        self.margin = margin
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.model = None
+
+    def load_model(self):
+        """Load the weights once, call it explicitly to warm up before the first frame"""
+        if self.model is None:
+            from models.experimental import attempt_load
+            from utils.torch_utils import select_device
+            device = select_device(self.device)
+            model = attempt_load(self.weights, map_location=device).autoshape()  # fused FP32, AutoShape wrapper
+            model.conf, model.iou = self.conf_thres, self.iou_thres
+            self.model = model
+        return self.model
+
+    @property
+    def names(self):
+        return self.load_model().names
+
+    def detect(self, frame, faces):
+        """Classify the emotion of each face of a BGR frame, returns a list of EmotionResult"""
+        faces = list(faces)
+        if not faces:
+            return []
+        model = self.load_model()
+        boxes = [crop_box(getattr(face, 'rect', face), frame.shape[:2], self.margin) for face in faces]
+        valid = [i for i, (x1, y1, x2, y2) in enumerate(boxes) if x2 > x1 and y2 > y1]  # face inside the frame
+        crops = [np.ascontiguousarray(frame[y1:y2, x1:x2, ::-1]) for x1, y1, x2, y2 in (boxes[i] for i in valid)]
+        pred = dict(zip(valid, model(crops, size=self.crop_size).xyxy)) if crops else {}  # one batch, (n, 6) per crop
+
+        results = []
+        for i, face in enumerate(faces):
+            track_id = getattr(face, 'track_id', None)
+            det = pred.get(i)
+            if det is None or not len(det):
+                results.append(EmotionResult(track_id, None, 0.0, None))
+                continue
+            *xyxy, conf, cls = det[det[:, 4].argmax()].tolist()  # most confident emotion of the face
+            x0, y0 = boxes[i][:2]
+            box = (xyxy[0] + x0, xyxy[1] + y0, xyxy[2] + x0, xyxy[3] + y0)
+            results.append(EmotionResult(track_id, self.names[int(cls)], conf, box))
+        return results
@@ -3,6 +3,11 @@
 Experimental modules
 """
 
+import hashlib
+import json
+import warnings
+from pathlib import Path
+
 import numpy as np
 import torch
 import torch.nn as nn
@@ -117,3 +122,62 @@ def attempt_load(weights, map_location=None, inplace=True, fuse=True):
             setattr(model, k, getattr(model[-1], k))
         model.stride = model[torch.argmax(torch.tensor([m.stride.max() for m in model])).int()].stride  # max stride
         return model  # return ensemble
+
+
+class TracedModel(nn.Module):
+    # TorchScript module traced by attempt_load_traced() for one static input shape, with the Model metadata
+    def __init__(self, module, shape, stride, names):
+        super().__init__()
+        self.module = module
+        self.shape = tuple(shape)  # (bs, 3, h, w) the module was traced for
+        self.stride = torch.tensor(stride)
+        self.names = names
+
+    def forward(self, x):
+        assert tuple(x.shape) == self.shape, f'input shape {tuple(x.shape)} does not match the traced shape {self.shape}'
+        return self.module(x)
+
+
+def attempt_load_traced(weights, imgsz=640, batch_size=1, map_location=None, candidate_thres=None, cache_dir=None):
+    """Loads weights as a TracedModel, a fused model traced with torch.jit.trace for one (batch_size, 3, h, w) shape
+
+    The traced module runs without the Python layer loop of Model._forward_once() and is saved next to the weights
+    (or in cache_dir) under a name keyed by the weights content, the shape, the device, candidate_thres and the torch
+    version, so later loads skip parse_model() and the trace. Detect grids are baked in for that shape, and
+    candidate_thres sets Detect.candidate_thres before tracing.
+    """
+    from models.yolo import Detect
+
+    device = torch.device(map_location or 'cpu')
+    h, w = (imgsz, imgsz) if isinstance(imgsz, int) else imgsz
+    shape = (batch_size, 3, h, w)
+    weights = Path(attempt_download(weights))
+    key = hashlib.md5(weights.read_bytes())
+    key.update(f'{shape}{device}{candidate_thres}{torch.__version__}'.encode())
+    f = Path(cache_dir or weights.parent) / f'{weights.stem}_{key.hexdigest()[:12]}.torchscript'
+
+    if f.exists():
+        extra_files = {'config.txt': ''}
+        module = torch.jit.load(str(f), map_location=device, _extra_files=extra_files)
+        d = json.loads(extra_files['config.txt'])
+        print(f'Loaded traced model {f}')
+        return TracedModel(module, d['shape'], d['stride'], d['names'])
+
+    model = attempt_load(weights, map_location=device, fuse=True)
+    assert not isinstance(model, Ensemble), 'attempt_load_traced() takes a single weights file'
+    assert h % int(model.stride.max()) == 0 and w % int(model.stride.max()) == 0, \
+        f'image size {(h, w)} must be a multiple of max stride {int(model.stride.max())}'
+    m = model.model[-1]
+    if isinstance(m, Detect):
+        m.warmup_grids([(h, w)], device)
+        m.candidate_thres = candidate_thres
+    im = torch.zeros(*shape, device=device)
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # suppress jit trace warnings
+        model(im)  # dry run
+        module = torch.jit.freeze(torch.jit.trace(model, im, strict=False))
+    d = {'shape': shape, 'stride': [float(s) for s in model.stride], 'names': model.names}
+    f.parent.mkdir(parents=True, exist_ok=True)
+    torch.jit.save(module, str(f), _extra_files={'config.txt': json.dumps(d)})
+    print(f'Traced model saved to {f}')
+    return TracedModel(module, d['shape'], d['stride'], d['names'])
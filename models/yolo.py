@@ -8,6 +8,7 @@ Usage:
 
 import argparse
 import sys
+from collections import OrderedDict
 from copy import deepcopy
 from pathlib import Path
 
@@ -36,6 +37,8 @@ LOGGER = logging.getLogger(__name__)
 class Detect(nn.Module):
     stride = None  # strides computed during build
     onnx_dynamic = False  # ONNX export parameter
+    grid_cache_size = 8  # decode grids kept per detection layer, LRU
+    candidate_thres = None  # inference only: output the cells with objectness above this, see _forward_candidates()
 
     def __init__(self, nc=80, anchors=(), ch=(), inplace=True):  # detection layer
         super().__init__()
@@ -50,6 +53,8 @@ class Detect(nn.Module):
         self.inplace = inplace  # use in-place ops (e.g. slice assignment)
 
     def forward(self, x):
+        if self.candidate_thres is not None and not self.training:
+            return self._forward_candidates(x)
         z = []  # inference output
         for i in range(self.nl):
             x[i] = self.m[i](x[i])  # conv
@@ -57,21 +62,67 @@ class Detect(nn.Module):
             x[i] = x[i].view(bs, self.na, self.no, ny, nx).permute(0, 1, 3, 4, 2).contiguous()
 
             if not self.training:  # inference
-                if self.grid[i].shape[2:4] != x[i].shape[2:4] or self.onnx_dynamic:
-                    self.grid[i], self.anchor_grid[i] = self._make_grid(nx, ny, i)
-
+                grid_xy, anchor_wh = self._decode_grid(nx, ny, i, x[i].device, x[i].dtype)
                 y = x[i].sigmoid()
+                # xy = (sig * 2 - 0.5 + grid) * stride = sig * 2 * stride + grid_xy
+                # wh = (sig * 2) ** 2 * anchor_grid = sig ** 2 * anchor_wh
                 if self.inplace:
-                    y[..., 0:2] = (y[..., 0:2] * 2. - 0.5 + self.grid[i]) * self.stride[i]  # xy
-                    y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * self.anchor_grid[i]  # wh
+                    xy, wh = y[..., 0:2], y[..., 2:4]  # views, updated in place without slice-assignment copies
+                    xy.mul_(2. * self.stride[i]).add_(grid_xy)
+                    wh.pow_(2).mul_(anchor_wh)
                 else:  # for YOLOv5 on AWS Inferentia https://github.com/ultralytics/yolov5/pull/2953
-                    xy = (y[..., 0:2] * 2. - 0.5 + self.grid[i]) * self.stride[i]  # xy
-                    wh = (y[..., 2:4] * 2) ** 2 * self.anchor_grid[i]  # wh
+                    xy = torch.addcmul(grid_xy, y[..., 0:2], 2. * self.stride[i])  # xy
+                    wh = y[..., 2:4] ** 2 * anchor_wh  # wh
                     y = torch.cat((xy, wh, y[..., 4:]), -1)
                 z.append(y.view(bs, -1, self.no))
 
         return x if self.training else (torch.cat(z, 1), x)
 
+    def _forward_candidates(self, x):
+        # Objectness is thresholded in logit space on the raw output, only the surviving cells are sigmoided and
+        # decoded. Returns ((candidates (n, no), image index (n,)), x) for candidates_non_max_suppression()
+        t = self.candidate_thres
+        logit = math.log(t / (1 - t)) if 0 < t < 1 else (-math.inf if t <= 0 else math.inf)  # sigmoid(v) > t
+        candidates, index = [], []
+        for i in range(self.nl):
+            x[i] = self.m[i](x[i])  # conv
+            bs, _, ny, nx = x[i].shape
+            p = x[i].view(bs, self.na, self.no, ny, nx)
+            b, a, gy, gx = (p[:, :, 4] > logit).nonzero(as_tuple=True)
+            y = p[b, a, :, gy, gx].sigmoid()  # (n, no) surviving cells only
+            grid_xy, anchor_wh = self._decode_grid(nx, ny, i, x[i].device, x[i].dtype)
+            y[:, 0:2] = torch.addcmul(grid_xy[0, a, gy, gx], y[:, 0:2], 2. * self.stride[i])  # xy
+            y[:, 2:4] = y[:, 2:4] ** 2 * anchor_wh[0, a, gy, gx]  # wh
+            candidates.append(y)
+            index.append(b)
+            x[i] = p.permute(0, 1, 3, 4, 2)  # x(bs,3,20,20,85) view
+        return (torch.cat(candidates), torch.cat(index)), x
+
+    def _decode_grid(self, nx, ny, i, device, dtype):
+        # (grid_xy, anchor_wh) of layer i for a (ny, nx) feature map, from an LRU cache keyed by shape, device, dtype
+        if self.onnx_dynamic:
+            grid, anchor_grid = self._make_grid(nx, ny, i)
+            return (grid - 0.5) * self.stride[i], anchor_grid * 4
+        cache = self.__dict__.setdefault('grid_cache', OrderedDict())  # not in checkpoints saved before the cache
+        key = (i, ny, nx, device, dtype)
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        grid, anchor_grid = self._make_grid(nx, ny, i)
+        self.grid[i], self.anchor_grid[i] = grid, anchor_grid
+        cache[key] = ((grid - 0.5) * self.stride[i]).to(device, dtype), (anchor_grid * 4).to(device, dtype)
+        if len(cache) > self.grid_cache_size * self.nl:
+            cache.popitem(last=False)  # least recently used
+        return cache[key]
+
+    def warmup_grids(self, shapes, device=None, dtype=torch.float32):
+        # pre-build the decode grids of the (height, width) input shapes that inference will use
+        device = device or self.anchors.device
+        for h, w in shapes:
+            for i in range(self.nl):
+                s = int(self.stride[i])
+                self._decode_grid(w // s, h // s, i, device, dtype)
+
     def _make_grid(self, nx=20, ny=20, i=0):
         d = self.anchors[i].device
         yv, xv = torch.meshgrid([torch.arange(ny).to(d), torch.arange(nx).to(d)])
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: adaptive.py
+
+Description: This module contains the adaptive detection rate controller of the live pipeline.
+It measures how long inference actually takes per frame and spaces the inferences so that they
+use at most BUDGET of the wall-clock time. Frames that arrive before the next inference is due
+are still displayed, only the detection is skipped, so a slow machine runs the detectors at a
+lower rate instead of letting frames queue up.
+
+Classes:
+    AdaptiveRate: Decides which frames are inferred from the measured processing time.
+"""
+BUDGET = 0.8            # fraction of the wall-clock time inference may use
+MAX_FPS = 30.0          # never infer more often than this
+SMOOTHING = 0.2         # EMA weight of the newest processing time
+
+
+class AdaptiveRate:
+    """Inference pacing from an EMA of the processing time.
+
+    Call due(t) for every frame and, for the frames that are inferred, update(t, elapsed) with the
+    start time and the measured duration. The next inference is due ``cost / budget`` seconds after
+    the start of the previous one, but not sooner than 1 / max_fps.
+    """
+
+    def __init__(self, budget=BUDGET, max_fps=MAX_FPS, smoothing=SMOOTHING):
+        assert 0 < budget <= 1, f'Invalid budget {budget}'
+        self.budget = budget
+        self.max_fps = max_fps
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.cost = None        # EMA of the processing time (s)
+        self.next_time = None   # time from which the next inference is due
+        self.inferred = 0
+        self.skipped = 0
+
+    @property
+    def interval(self):
+        # seconds between two inferences
+        cost = self.cost or 0.0
+        return max(cost / self.budget, 1 / self.max_fps if self.max_fps else 0.0)
+
+    @property
+    def fps(self):
+        # current detection rate
+        return 1 / self.interval if self.interval else float('inf')
+
+    def due(self, t):
+        if self.next_time is None or t >= self.next_time:
+            return True
+        self.skipped += 1
+        return False
+
+    def update(self, t, elapsed):
+        self.cost = elapsed if self.cost is None else self.cost + self.smoothing * (elapsed - self.cost)
+        self.next_time = t + self.interval
+        self.inferred += 1
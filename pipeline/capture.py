@@ -0,0 +1,97 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: capture.py
+
+Description: This module contains a latest-frame-wins camera source. A daemon thread keeps
+grabbing frames (the grab/retrieve loop of utils.datasets.LoadStreams.update) so that OpenCV's
+internal buffer never fills up, and the consumer always receives the newest frame instead of
+one that has been waiting for seconds. Frames the consumer never saw are counted as dropped.
+
+Classes:
+    LatestFrameCapture: Background frame grabber with a single-frame buffer.
+"""
+import threading
+import time
+
+import cv2
+
+from pipeline.profiling import NULL_PROFILER
+
+
+class LatestFrameCapture:
+    """Drop-in for cv2.VideoCapture.read() that always returns the newest frame.
+
+    on_frame(frame_id, frame), if given, is called from the grabbing thread for every frame, e.g. to
+    display all frames while the detector only reads the latest ones. profiler times grab+retrieve
+    as stage 'capture'.
+    """
+
+    def __init__(self, source=0, on_frame=None, profiler=None):
+        self.source = source
+        self.on_frame = on_frame
+        self.profiler = profiler or NULL_PROFILER
+        self.cap = cv2.VideoCapture(source)
+        self.fps = max(self.cap.get(cv2.CAP_PROP_FPS) % 100, 0) or 30.0  # 30 FPS fallback
+        self.frame = None
+        self.frame_id = 0       # id of the newest frame
+        self.read_id = 0        # id of the last frame handed to read()
+        self.grabbed = 0        # frames grabbed from the device
+        self.dropped = 0        # frames overwritten before read() could return them
+        self.running = self.cap.isOpened()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.update, daemon=True)
+        if self.running:
+            self.thread.start()
+
+    def isOpened(self):
+        return self.running
+
+    def update(self):
+        # Read frames in daemon thread
+        while self.running and self.cap.isOpened():
+            t = time.perf_counter()
+            if not self.cap.grab():
+                if isinstance(self.source, str) and not self.source.startswith(('rtsp://', 'rtmp://', 'http')):
+                    break  # end of video file
+                print('WARNING: Video stream unresponsive, please check your camera connection.')
+                time.sleep(1 / self.fps)
+                self.cap.open(self.source)  # re-open stream if signal was lost
+                continue
+            success, im = self.cap.retrieve()
+            if not success:
+                continue
+            self.profiler.record('capture', time.perf_counter() - t)
+            with self.condition:
+                if self.frame_id > self.read_id:
+                    self.dropped += 1  # the previous frame was never read
+                self.frame = im
+                self.frame_id += 1
+                self.grabbed += 1
+                frame_id = self.frame_id
+                self.condition.notify_all()
+            if self.on_frame:
+                self.on_frame(frame_id, im)
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.cap.release()
+
+    def read(self, timeout=1.0):
+        """Wait for a frame newer than the last one returned, returns (success, frame) like cv2"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.frame_id > self.read_id or not self.running, timeout):
+                return False, None
+            if self.frame_id == self.read_id:  # stopped without a new frame
+                return False, None
+            self.read_id = self.frame_id
+            return True, self.frame
+
+    def release(self):
+        self.running = False
+        if self.thread.is_alive():
+            if self.thread is not threading.current_thread():
+                self.thread.join()
+        else:
+            self.cap.release()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: profiling.py
+
+Description: This module contains the per-stage latency instrumentation of the live pipeline.
+Every instrumented stage (capture, HOG detection, tracking, landmarks, the scheduler stages,
+drawing, Qt conversion) is timed with a context manager modelled on utils.general.Profile, and
+the last WINDOW durations of each stage are kept to report rolling p50/p95/p99. It only uses
+time.perf_counter, so that the fatigue pipeline does not need torch to be profiled. A disabled
+Profiler hands out one shared no-op context, so leaving the instrumentation in costs near zero.
+
+Classes:
+    StageTimer: Context manager timing one run of a stage.
+    Profiler: Rolling per-stage latency statistics with a periodic log line.
+"""
+import contextlib
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+WINDOW = 300            # samples kept per stage, ~10 s at 30 FPS
+LOG_INTERVAL = 10.0     # seconds between two log lines, 0 disables the log
+
+NULL_TIMER = contextlib.nullcontext()
+
+
+class StageTimer(contextlib.ContextDecorator):
+    # Usage: with profiler.time('landmarks'): ...
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, type, value, traceback):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    """Rolling latency percentiles per stage name.
+
+    time(name) returns the context manager to wrap a stage with, record(name, seconds) adds an
+    externally measured duration. Samples may be recorded from several threads (e.g. capture and
+    inference). tick() prints summary() every ``log_interval`` seconds.
+    """
+
+    def __init__(self, enabled=True, window=WINDOW, log_interval=LOG_INTERVAL):
+        self.enabled = enabled
+        self.window = window
+        self.log_interval = log_interval
+        self.samples = {}       # {stage name: deque of durations (s)}
+        self.last_log = time.perf_counter()
+
+    def time(self, name):
+        return StageTimer(self, name) if self.enabled else NULL_TIMER
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples.setdefault(name, deque(maxlen=self.window))
+        samples.append(seconds)
+
+    def percentiles(self):
+        """{stage name: (p50, p95, p99) in ms} over the rolling window"""
+        stats = {}
+        for name, samples in list(self.samples.items()):
+            values = list(samples)
+            if values:
+                stats[name] = tuple(np.percentile(values, (50, 95, 99)) * 1E3)
+        return stats
+
+    def summary(self):
+        return ' | '.join(f'{name} {p50:.1f}/{p95:.1f}/{p99:.1f}'
+                          for name, (p50, p95, p99) in self.percentiles().items())
+
+    def tick(self):
+        # periodic log line of p50/p95/p99 (ms) per stage
+        if not self.enabled or not self.log_interval:
+            return
+        now = time.perf_counter()
+        if now - self.last_log >= self.log_interval:
+            self.last_log = now
+            print(f'Latency p50/p95/p99 (ms): {self.summary()}', file=sys.stderr)
+
+
+# shared disabled profiler, the default of every instrumented component
+NULL_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: scheduler.py
+
+Description: This module contains the multimodal inference scheduler. The dlib fatigue stage and
+the YOLOv5 emotion and behavior detectors are registered as stages, each with its own rate, and
+are run in order over every captured frame. A stage that is not due on a frame keeps its last
+result, so a 5 FPS behavior model costs nothing on the frames in between. The decoded frame and
+its preprocessed variants (letterboxed network input, grayscale, ...) are computed once per frame
+in a FramePacket and shared by all the stages that run on it.
+
+Classes:
+    FramePacket: One captured frame with its shared preprocessing and the results of this frame.
+    Stage: One model of the pipeline and its rate.
+    ScheduledResult: Latest result of every stage after one frame.
+    InferenceScheduler: Runs the due stages over each frame.
+"""
+import time
+
+import cv2
+
+from pipeline.profiling import NULL_PROFILER
+
+# default rate of each stage in FPS, None runs the stage on every frame
+FATIGUE_FPS = None
+EMOTION_FPS = 10
+BEHAVIOR_FPS = 5
+
+
+class FramePacket:
+    """A BGR frame as handed to the stages.
+
+    Preprocessing goes through shared(), so the first stage that needs e.g. the 640 letterbox
+    computes it and the following ones reuse it. ``results`` holds the outputs of the stages
+    that already ran on this frame, e.g. the face boxes of the fatigue stage for the emotion stage.
+    """
+
+    def __init__(self, frame, frame_id=0, timestamp=None):
+        self.frame = frame
+        self.frame_id = frame_id
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self.results = {}
+        self.cache = {}
+
+    def shared(self, key, fn):
+        # fn() computed once per frame and key
+        if key not in self.cache:
+            self.cache[key] = fn()
+        return self.cache[key]
+
+    @property
+    def gray(self):
+        return self.shared('gray', lambda: cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY))
+
+    def letterbox(self, size=640, stride=32):
+        """(img, ratio, pad) of utils.augmentations.letterbox at a fixed size x size input, BGR HWC"""
+        from utils.augmentations import letterbox
+        return self.shared(('letterbox', size, stride), lambda: letterbox(self.frame, size, auto=False, stride=stride))
+
+
+class Stage:
+    """A named model run at most ``fps`` times per second, fn(packet) returns its result and
+    load(), if given, loads and warms up the model"""
+
+    def __init__(self, name, fn, fps=None, load=None):
+        self.name = name
+        self.fn = fn
+        self.load = load
+        self.period = 1.0 / fps if fps else 0.0
+        self.reset()
+
+    def reset(self):
+        self.next_time = None   # timestamp from which the stage is due again
+        self.result = None      # last result
+        self.runs = 0
+
+    def due(self, t):
+        return self.next_time is None or t >= self.next_time
+
+    def run(self, packet):
+        t = packet.timestamp
+        # keep the cadence of the period, but never try to catch up with missed runs
+        self.next_time = t + self.period if self.next_time is None else self.next_time + self.period
+        if self.next_time <= t:
+            self.next_time = t + self.period
+        self.result = self.fn(packet)
+        self.runs += 1
+        return self.result
+
+
+class ScheduledResult:
+    """Latest result of every stage after one frame, ``updated`` names the stages that ran on it"""
+
+    def __init__(self, frame_id, timestamp, results, updated):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.results = results      # {stage name: last result, None if the stage never ran}
+        self.updated = updated
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def get(self, name, default=None):
+        result = self.results.get(name)
+        return default if result is None else result
+
+
+class InferenceScheduler:
+    """Runs the registered stages in order over each frame, every stage at its own rate.
+
+    Stages are registered with add(); a stage may read the results that earlier stages produced on
+    the same frame from ``packet.results``. When one of them has not run on this frame it sees its
+    previous result through ``packet.results`` instead, so a slower stage always has some input.
+    Each stage run is timed under its name by ``profiler``. load() loads all the models up front,
+    call it from the thread that runs process() so that the GUI thread never waits for it.
+    """
+
+    def __init__(self, profiler=None):
+        self.stages = []
+        self.frame_id = 0
+        self.profiler = profiler or NULL_PROFILER
+
+    def add(self, name, fn, fps=None, load=None):
+        assert name not in [stage.name for stage in self.stages], f'Stage {name} already registered'
+        self.stages.append(Stage(name, fn, fps, load))
+        return self
+
+    def load(self):
+        """Load and warm up the model of every stage, otherwise each one loads on its first run"""
+        for stage in self.stages:
+            if stage.load is not None:
+                stage.load()
+        return self
+
+    def reset(self):
+        self.frame_id = 0
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, frame, timestamp=None):
+        """Run the due stages over one BGR frame and return a ScheduledResult"""
+        self.frame_id += 1
+        packet = frame if isinstance(frame, FramePacket) else FramePacket(frame, self.frame_id, timestamp)
+        updated = []
+        for stage in self.stages:
+            if stage.due(packet.timestamp):
+                with self.profiler.time(stage.name):
+                    stage.run(packet)
+                updated.append(stage.name)
+            packet.results[stage.name] = stage.result
+        return ScheduledResult(packet.frame_id, packet.timestamp, dict(packet.results), updated)
+
+
+def build_scheduler(fatigue=None, fatigue_fps=FATIGUE_FPS, emotion=None, emotion_fps=EMOTION_FPS,
+                    behavior=None, behavior_fps=BEHAVIOR_FPS, profiler=None):
+    """Scheduler of the live monitor, running a FatigueDetector as stage 'fatigue' and, when given,
+    an EmotionDetector on the faces it found as stage 'emotion' and a BehaviorDetector on the
+    shared letterboxed frame as stage 'behavior'. The behavior stage returns the BehaviorState of
+    a BehaviorSmoother, which holds stable labels between its runs. profiler is shared with the
+    default FatigueDetector. No model is loaded here, see InferenceScheduler.load()"""
+    from drowsiness_detection.fatigue_detection import FatigueDetector, load_models
+    fatigue = fatigue or FatigueDetector(profiler=profiler)
+    scheduler = InferenceScheduler(profiler)
+    scheduler.add('fatigue', lambda packet: fatigue.detect(packet.frame, packet.timestamp, packet.gray), fatigue_fps,
+                  load_models)
+    if emotion is not None:
+        scheduler.add('emotion', lambda packet: emotion.detect(packet.frame, packet.results['fatigue'].faces),
+                      emotion_fps, emotion.load_model)
+    if behavior is not None:
+        from behavior_detection.smoothing import BehaviorSmoother
+        smoother = BehaviorSmoother()
+
+        def detect_behavior(packet):
+            result = behavior.detect([packet.frame], [packet.letterbox(behavior.img_size, behavior.stride)])[0]
+            return smoother.update(result, packet.timestamp)
+
+        scheduler.add('behavior', detect_behavior, behavior_fps, behavior.load_model)
+    return scheduler
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: service.py
+
+Description: Headless fatigue monitor for boxes without a display. It runs the same pipeline as
+the GUI (LatestFrameCapture -> InferenceScheduler -> fatigue/emotion/behavior state) but never
+imports PySide2, and publishes every status change to a callback, a JSON-lines stream (stdout or
+a file) and/or a local UDP socket, one JSON object per change.
+
+Classes:
+    JsonLinesPublisher: Writes status events as JSON lines to a stream.
+    UdpPublisher: Sends status events as JSON datagrams to a local socket.
+    FatigueService: Capture/inference loop calling on_status for each status change.
+
+Usage:
+    python pipeline/service.py --source 0 --jsonl -
+    python pipeline/service.py --source 0 --udp 127.0.0.1:9999 --behavior-weights weight/behavior.pt
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # repository root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from pipeline.adaptive import BUDGET, AdaptiveRate
+from pipeline.capture import LatestFrameCapture
+from pipeline.profiling import Profiler
+from pipeline.scheduler import build_scheduler
+
+
+def status_of(result):
+    """Discrete status of a ScheduledResult: fatigue flag, driver emotion and active behaviors"""
+    status = {}
+    fatigue = result.get('fatigue')
+    if fatigue is not None:
+        status['fatigue'] = bool(fatigue.fatigue)
+        status['face'] = fatigue.driver is not None
+    emotions = result.get('emotion')
+    if emotions is not None:
+        driver_id = fatigue.driver_id if fatigue is not None else None
+        # driver face last, when it was found
+        status['emotion'] = emotions[-1].label if emotions and emotions[-1].track_id == driver_id else None
+    behavior = result.get('behavior')
+    if behavior is not None:
+        status['behavior'] = sorted(behavior.labels)
+    return status
+
+
+class JsonLinesPublisher:
+    """Callable writing each event as one JSON line, flushed so that readers see it at once"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event) + '\n')
+        self.stream.flush()
+
+
+class UdpPublisher:
+    """Callable sending each event as one JSON datagram to (host, port)"""
+
+    def __init__(self, address):
+        self.address = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, event):
+        self.socket.sendto(json.dumps(event).encode(), self.address)
+
+
+class FatigueService:
+    """Reads the newest frame of source, runs the scheduler on it and calls on_status(event) when the
+    status returned by status_of() changes. event holds the status plus time, frame id and PERCLOS.
+    """
+
+    def __init__(self, source=0, scheduler=None, on_status=None, rate=None):
+        self.source = source
+        self.scheduler = scheduler or build_scheduler()
+        self.rate = rate or AdaptiveRate()
+        self.on_status = on_status or (lambda event: None)
+        self.status = None
+        self.running = False
+
+    def publish(self, result):
+        status = status_of(result)
+        if status == self.status:
+            return
+        self.status = status
+        fatigue = result.get('fatigue')
+        event = dict(time=time.time(), frame=result.frame_id, **status)
+        if fatigue is not None:
+            event['perclos'] = {str(k): round(v, 4) for k, v in fatigue.perclos.items()}
+        self.on_status(event)
+
+    def run(self):
+        self.scheduler.load()  # load and warm up the models before the first frame
+        capture = LatestFrameCapture(self.source, profiler=self.scheduler.profiler)
+        if not capture.isOpened():
+            raise RuntimeError(f'Failed to open {self.source}')
+        self.running = True
+        try:
+            while self.running:
+                success, frame = capture.read(timeout=0.1)
+                if not success:
+                    if not capture.isOpened():
+                        break  # stream ended
+                    continue
+                t = time.monotonic()
+                if not self.rate.due(t):
+                    continue
+                result = self.scheduler.process(frame, t)
+                self.rate.update(t, time.monotonic() - t)
+                self.publish(result)
+                self.scheduler.profiler.tick()
+        finally:
+            capture.release()
+            print(f'Capture stopped: {capture.grabbed} frames grabbed, {capture.dropped} dropped, '
+                  f'{self.rate.skipped} skipped, detection at {self.rate.fps:.1f} FPS', file=sys.stderr)
+
+    def stop(self):
+        self.running = False
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default='0', help='camera index, video file or stream url')
+    parser.add_argument('--jsonl', default=None, help='JSON-lines output file, - for stdout')
+    parser.add_argument('--udp', default=None, help='host:port to send JSON datagrams to')
+    parser.add_argument('--emotion-weights', default=None, help='enable the emotion stage with these weights')
+    parser.add_argument('--behavior-weights', default=None, help='enable the behavior stage with these weights')
+    parser.add_argument('--traced', action='store_true', help='run the behavior model as a cached TorchScript trace')
+    parser.add_argument('--profile', action='store_true', help='log per-stage latency percentiles')
+    parser.add_argument('--budget', type=float, default=BUDGET, help='fraction of the time inference may use')
+    opt = parser.parse_args()
+    opt.source = int(opt.source) if opt.source.isnumeric() else opt.source
+    return opt
+
+
+def main(opt):
+    publishers = []
+    if opt.jsonl:
+        publishers.append(JsonLinesPublisher(sys.stdout if opt.jsonl == '-' else open(opt.jsonl, 'a')))
+    if opt.udp:
+        host, port = opt.udp.rsplit(':', 1)
+        publishers.append(UdpPublisher((host, int(port))))
+    if not publishers:
+        publishers.append(JsonLinesPublisher(sys.stdout))
+
+    emotion = behavior = None
+    if opt.emotion_weights:
+        assert os.path.exists(opt.emotion_weights), f'{opt.emotion_weights} does not exist'
+        from emotion_detection.emotion_detector import EmotionDetector
+        emotion = EmotionDetector(opt.emotion_weights)
+    if opt.behavior_weights:
+        assert os.path.exists(opt.behavior_weights), f'{opt.behavior_weights} does not exist'
+        from behavior_detection.behavior_detector import BehaviorDetector
+        behavior = BehaviorDetector(opt.behavior_weights, traced=opt.traced)
+
+    def on_status(event):
+        for publish in publishers:
+            publish(event)
+
+    profiler = Profiler() if opt.profile else None
+    service = FatigueService(opt.source, build_scheduler(emotion=emotion, behavior=behavior, profiler=profiler),
+                             on_status, AdaptiveRate(opt.budget))
+    signal.signal(signal.SIGTERM, lambda *_: service.stop())
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(parse_opt())
@@ -605,12 +605,16 @@ def clip_coords(boxes, shape):
 
 
 def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=None, agnostic=False, multi_label=False,
-                        labels=(), max_det=300):
+                        labels=(), max_det=300, batched=False):
     """Runs Non-Maximum Suppression (NMS) on inference results
 
+    batched=True runs a single NMS over the whole batch (see batched_non_max_suppression)
+
     Returns:
          list of detections, on (n,6) tensor per image [xyxy, conf, cls]
     """
+    if batched and not labels:
+        return batched_non_max_suppression(prediction, conf_thres, iou_thres, classes, agnostic, multi_label, max_det)
 
     nc = prediction.shape[2] - 5  # number of classes
     xc = prediction[..., 4] > conf_thres  # candidates
@@ -698,6 +702,85 @@ def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=Non
     return output
 
 
+def batched_non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=None, agnostic=False,
+                                multi_label=False, max_det=300):
+    """Non-Maximum Suppression over a whole batch without a per-image Python loop
+
+    Same output as non_max_suppression(): the candidates of all images are gathered at once, the boxes are
+    offset by image index as well as by class, and a single torchvision.ops.nms() call handles the batch.
+    The per-image max_nms and max_det limits are applied with one sort on (image, -confidence).
+
+    Returns:
+         list of detections, on (n,6) tensor per image [xyxy, conf, cls]
+    """
+    b, a = (prediction[..., 4] > conf_thres).nonzero(as_tuple=True)  # image and anchor index of the candidates
+    return candidates_non_max_suppression(prediction[b, a], b, prediction.shape[0], conf_thres, iou_thres, classes,
+                                          agnostic, multi_label, max_det)
+
+
+def candidates_non_max_suppression(x, b, bs, conf_thres=0.25, iou_thres=0.45, classes=None, agnostic=False,
+                                   multi_label=False, max_det=300):
+    """batched_non_max_suppression() on already gathered candidates
+
+    x (n, nc+5) holds the decoded candidates of a batch of bs images, with objectness above conf_thres, and b (n,)
+    their image index, e.g. the output of Detect() with candidate_thres set. x is modified in place.
+
+    Returns:
+         list of detections, on (n,6) tensor per image [xyxy, conf, cls]
+    """
+    assert 0 <= conf_thres <= 1, f'Invalid Confidence threshold {conf_thres}, valid values are between 0.0 and 1.0'
+    assert 0 <= iou_thres <= 1, f'Invalid IoU {iou_thres}, valid values are between 0.0 and 1.0'
+
+    nc = x.shape[1] - 5  # number of classes
+    max_wh = 4096  # (pixels) maximum box width and height
+    max_nms = 30000  # maximum number of boxes per image into torchvision.ops.nms()
+    max_joint = 1000 if x.device.type == 'cpu' else 20000  # above, NMS per image (quadratic on CPU)
+    multi_label &= nc > 1  # multiple labels per box
+
+    x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+    box = xywh2xyxy(x[:, :4])
+
+    # Detections matrix nx6 (xyxy, conf, cls) and image index
+    if multi_label:
+        i, j = (x[:, 5:] > conf_thres).nonzero(as_tuple=False).T
+        x, b = torch.cat((box[i], x[i, j + 5, None], j[:, None].float()), 1), b[i]
+    else:  # best class only
+        conf, j = x[:, 5:].max(1, keepdim=True)
+        keep = conf.view(-1) > conf_thres
+        x, b = torch.cat((box, conf, j.float()), 1)[keep], b[keep]
+
+    # Filter by class
+    if classes is not None:
+        keep = (x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)
+        x, b = x[keep], b[keep]
+
+    def per_image_top(order, limit):
+        # indices into x -> the `limit` most confident of each image, grouped by image, confidence descending
+        key = b[order].double() * 2 + (1 - x[order, 4].double())  # image ascending, confidence descending
+        order = order[key.argsort()]
+        counts = torch.bincount(b[order], minlength=bs)
+        rank = torch.arange(len(order), device=x.device) - (counts.cumsum(0) - counts).repeat_interleave(counts)
+        return order[rank < limit]
+
+    if len(x) and torch.bincount(b, minlength=bs).max() > max_nms:  # excess boxes
+        keep = per_image_top(torch.arange(len(x), device=x.device), max_nms)
+        x, b = x[keep], b[keep]
+
+    if len(x) > max_joint:  # NMS per image, only the torchvision.ops.nms() calls remain in the loop
+        order = per_image_top(torch.arange(len(x), device=x.device), max_nms)
+        output = []
+        for xi in x[order].split(torch.bincount(b, minlength=bs).tolist()):
+            c = xi[:, 5:6] * (0 if agnostic else max_wh)  # classes
+            output.append(xi[torchvision.ops.nms(xi[:, :4] + c, xi[:, 4], iou_thres)[:max_det]])
+        return output
+
+    # One NMS for the batch, groups offset by image and class (float64 keeps the offset boxes exact)
+    g = b * (1 if agnostic else nc) + (0 if agnostic else x[:, 5].long())  # group index
+    boxes = x[:, :4].double() + g[:, None].double() * max_wh
+    i = per_image_top(torchvision.ops.nms(boxes, x[:, 4].double(), iou_thres), max_det)
+    return list(x[i].split(torch.bincount(b[i], minlength=bs).tolist()))
+
+
 def strip_optimizer(f='best.pt', s=''):  # from utils.general import *; strip_optimizer()
     # Strip optimizer from 'f' to finalize training, optionally save as 's'
     x = torch.load(f, map_location=torch.device('cpu'))
@@ -0,0 +1,152 @@
+# YOLOv5 🚀 by Ultralytics, GPL-3.0 license
+"""
+NumPy Non-Maximum Suppression, for models exported to ONNX Runtime / TFLite without torch and torchvision
+
+Same semantics as utils.general.non_max_suppression(): objectness prefilter, conf = obj_conf * cls_conf,
+best class or multi-label, class filter, class-offset greedy NMS, max_nms and max_det. This module only
+imports NumPy, so edge deployments do not have to load torch just for the postprocessing.
+"""
+
+import time
+
+import numpy as np
+
+
+def xywh2xyxy(x):
+    # Convert nx4 boxes from [x, y, w, h] to [x1, y1, x2, y2] where xy1=top-left, xy2=bottom-right
+    y = np.copy(x)
+    y[:, 0] = x[:, 0] - x[:, 2] / 2  # top left x
+    y[:, 1] = x[:, 1] - x[:, 3] / 2  # top left y
+    y[:, 2] = x[:, 0] + x[:, 2] / 2  # bottom right x
+    y[:, 3] = x[:, 1] + x[:, 3] / 2  # bottom right y
+    return y
+
+
+def box_iou(box, boxes, area=None, areas=None):
+    # IoU of one xyxy box (4,) with n xyxy boxes (n,4), as computed by torchvision.ops.nms()
+    if area is None:
+        area = (box[2] - box[0]) * (box[3] - box[1])
+    if areas is None:
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    w = (np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0])).clip(0)
+    h = (np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1])).clip(0)
+    inter = w * h
+    return inter / (area + areas - inter)
+
+
+def nms(boxes, scores, iou_thres, max_det=None, max_matrix=2048, chunk=256):
+    """Greedy NMS, NumPy equivalent of torchvision.ops.nms()
+
+    Returns the indices of the kept boxes sorted by decreasing score. With max_det the loop stops as soon as
+    max_det boxes are kept, since the boxes are visited in score order the result is the same as [:max_det].
+    Up to max_matrix boxes the (n, n) overlap matrix is computed up front, ``chunk`` rows at a time so the float
+    temporaries stay at (chunk, n) and only the boolean matrix (4 MB at 2048) is held, and the greedy pass only
+    reads its rows. Above that the IoU of each kept box with the remaining ones is computed on the fly.
+    """
+    order = np.argsort(-scores, kind='stable')
+    boxes = boxes[order]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    n, keep = len(order), []
+    if n <= max_matrix:
+        over = np.empty((n, n), dtype=bool)
+        for i in range(0, n, chunk):
+            b = boxes[i:i + chunk, None]
+            lt = np.maximum(b[..., :2], boxes[None, :, :2])
+            rb = np.minimum(b[..., 2:], boxes[None, :, 2:])
+            inter = (rb - lt).clip(0).prod(2)
+            iou = inter / (areas[i:i + chunk, None] + areas[None] - inter)
+            over[i:i + chunk] = iou > iou_thres  # NaN IoU does not suppress
+        suppressed = np.zeros(n, dtype=bool)
+        for i in range(n):
+            if suppressed[i]:
+                continue
+            keep.append(i)
+            if max_det and len(keep) >= max_det:
+                break  # early exit
+            suppressed |= over[i]
+    else:
+        rest = np.arange(n)
+        while rest.size:
+            i, rest = rest[0], rest[1:]
+            keep.append(i)
+            if max_det and len(keep) >= max_det:
+                break  # early exit
+            iou = box_iou(boxes[i], boxes[rest], areas[i], areas[rest])
+            rest = rest[~(iou > iou_thres)]  # NaN IoU (empty boxes) does not suppress, as in torchvision
+    return order[np.array(keep, dtype=np.int64)]
+
+
+def non_max_suppression(prediction, conf_thres=0.25, iou_thres=0.45, classes=None, agnostic=False, multi_label=False,
+                        labels=(), max_det=300):
+    """Runs Non-Maximum Suppression (NMS) on inference results, prediction is a (bs, n, nc+5) np.ndarray
+
+    Returns:
+         list of detections, on (n,6) np.ndarray per image [xyxy, conf, cls]
+    """
+
+    nc = prediction.shape[2] - 5  # number of classes
+    xc = prediction[..., 4] > conf_thres  # candidates
+
+    # Checks
+    assert 0 <= conf_thres <= 1, f'Invalid Confidence threshold {conf_thres}, valid values are between 0.0 and 1.0'
+    assert 0 <= iou_thres <= 1, f'Invalid IoU {iou_thres}, valid values are between 0.0 and 1.0'
+
+    # Settings
+    max_wh = 4096  # (pixels) maximum box width and height
+    max_nms = 30000  # maximum number of boxes into nms()
+    time_limit = 10.0  # seconds to quit after
+    multi_label &= nc > 1  # multiple labels per box
+
+    t = time.time()
+    output = [np.zeros((0, 6), dtype=prediction.dtype)] * prediction.shape[0]
+    for xi, x in enumerate(prediction):  # image index, image inference
+        x = x[xc[xi]]  # confidence
+
+        # Cat apriori labels if autolabelling
+        if len(labels) and len(labels[xi]):
+            l = labels[xi]
+            v = np.zeros((len(l), nc + 5), dtype=x.dtype)
+            v[:, :4] = l[:, 1:5]  # box
+            v[:, 4] = 1.0  # conf
+            v[range(len(l)), l[:, 0].astype(int) + 5] = 1.0  # cls
+            x = np.concatenate((x, v), 0)
+
+        # If none remain process next image
+        if not x.shape[0]:
+            continue
+
+        # Compute conf
+        x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+
+        # Box (center x, center y, width, height) to (x1, y1, x2, y2)
+        box = xywh2xyxy(x[:, :4])
+
+        # Detections matrix nx6 (xyxy, conf, cls)
+        if multi_label:
+            i, j = (x[:, 5:] > conf_thres).nonzero()
+            x = np.concatenate((box[i], x[i, j + 5, None], j[:, None].astype(x.dtype)), 1)
+        else:  # best class only
+            j = x[:, 5:].argmax(1)[:, None]
+            conf = np.take_along_axis(x[:, 5:], j, 1)
+            x = np.concatenate((box, conf, j.astype(x.dtype)), 1)[conf.reshape(-1) > conf_thres]
+
+        # Filter by class
+        if classes is not None:
+            x = x[(x[:, 5:6] == np.array(classes, dtype=x.dtype)).any(1)]
+
+        # Check shape
+        n = x.shape[0]  # number of boxes
+        if not n:  # no boxes
+            continue
+        elif n > max_nms:  # excess boxes
+            x = x[np.argsort(-x[:, 4], kind='stable')[:max_nms]]  # sort by confidence
+
+        # Batched NMS
+        c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
+        i = nms(x[:, :4] + c, x[:, 4], iou_thres, max_det)  # boxes (offset by class), scores
+        output[xi] = x[i]
+        if (time.time() - t) > time_limit:
+            print(f'WARNING: NMS time limit {time_limit}s exceeded')
+            break  # time limit exceeded
+
+    return output
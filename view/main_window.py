@@ -12,24 +12,44 @@ Classes:
     MainWindow: Creates the main application window and initializes all UI components.
 """
 
+import os
+
 import cv2
+import numpy as np
 from PySide2.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QHBoxLayout, QPushButton, QGridLayout, QRadioButton, QButtonGroup
 )
 from PySide2.QtGui import QImage, QPixmap
-from PySide2.QtCore import QTimer, Qt
-from drowsiness_detection.fatigue_detection import detFatigue
+from PySide2.QtCore import Qt
+from behavior_detection.behavior_detector import BEHAVIOR_WEIGHTS, BehaviorDetector
+from drowsiness_detection.fatigue_detection import draw_fatigue
+from emotion_detection.emotion_detector import EMOTION_WEIGHTS, EmotionDetector
+from pipeline.profiling import NULL_PROFILER, Profiler
+from pipeline.scheduler import build_scheduler
+from view.workers import DetectionWorker
+
+DISPLAY_SIZE = (640, 480)  # (w, h) of the video label
+# Qt >= 5.14 displays BGR directly, otherwise the channels are swapped together with the mirror flip
+FORMAT_BGR888 = getattr(QImage, 'Format_BGR888', None)
 
 
 class FatigueStatusApp(QWidget):
 
-    def __init__(self):
+    def __init__(self, profile=False):
         super().__init__()
         self.setWindowTitle("Fatigue Status Monitor")
         self.setGeometry(100, 100, 800, 600)
 
-        self.cap = None  # 摄像头对象初始化
-        self.timer = QTimer(self)
+        self.worker = None  # 采集与检测线程
+        self.result = None  # 最近一次检测结果
+        # 各阶段耗时统计 (p50/p95/p99), 开启时在画面上显示并定期输出日志
+        self.profiler = Profiler() if profile else NULL_PROFILER
+
+        # 预分配的显示缓冲区, QImage 直接引用 self.display, 每帧不再分配新数组
+        w, h = DISPLAY_SIZE
+        self.resized = np.empty((h, w, 3), dtype=np.uint8)  # 缩放后的帧
+        self.display = np.empty_like(self.resized)  # 镜像后的帧
+        self.image = QImage(self.display.data, w, h, w * 3, FORMAT_BGR888 or QImage.Format_RGB888)
 
         # 主布局
         main_layout = QVBoxLayout()
@@ -91,43 +111,81 @@ class FatigueStatusApp(QWidget):
 
     def start_camera(self):
         """启动摄像头并显示视频"""
-        if self.cap:
-            self.cap.release()
-
-        # 默认使用索引为 0 的摄像头
-        self.cap = cv2.VideoCapture(0)
-
-        # 检查摄像头是否成功打开
-        if not self.cap.isOpened():
-            print("Failed to open the camera.")
-            self.fatigue_status.setText("Failed to initialize the camera.")
-            return
-
-        # 启动视频帧更新定时器
-        self.timer.start(10)
-        self.timer.timeout.connect(self.update_frame)
+        self.stop_camera()
+
+        # 默认使用索引为 0 的摄像头, 后台持续采集, 检测总是处理最新一帧
+        # 表情识别只在人脸区域上运行, 行为检测模型常驻内存, 权重不存在时跳过
+        # 模型在检测线程中加载和预热, 界面不会卡住; 加载失败通过 failed 信号返回
+        emotion = EmotionDetector() if os.path.exists(EMOTION_WEIGHTS) else None
+        behavior = BehaviorDetector() if os.path.exists(BEHAVIOR_WEIGHTS) else None
+        scheduler = build_scheduler(emotion=emotion, behavior=behavior, profiler=self.profiler)
+        self.worker = DetectionWorker(0, scheduler, parent=self)
+        self.worker.frame_ready.connect(self.update_frame)
+        self.worker.failed.connect(self.camera_failed)
+        self.worker.result_ready.connect(self.update_result)
+        self.result = None
+        self.fatigue_status.setText("Loading models...")  # 第一次检测结果到达时更新
+        self.worker.start()
+
+    def stop_camera(self):
+        """停止采集和检测线程"""
+        if self.worker:
+            self.worker.stop()
+            self.worker = None
+
+    def camera_failed(self, message):
+        # 摄像头无法打开或模型加载失败
+        print(message)
+        self.fatigue_status.setText(message)
+        self.stop_camera()
+
+    def update_result(self, result):
+        """检测线程返回结果"""
+        self.result = result
+        fatigue = result.get('fatigue')
+        if fatigue is not None:
+            self.fatigue_status.setText(str(fatigue.fatigue))
+        emotions = result.get('emotion')
+        if emotions and fatigue is not None and emotions[-1].track_id == fatigue.driver_id:
+            # 主驾驶人脸在列表最后, 主驾驶未检测到时不更新
+            self.emotion_status.setText(emotions[-1].label or "Unknown")
+        behavior = result.get('behavior')
+        if behavior is not None:
+            self.phone_status.setChecked('phone' in behavior)
+            self.water_status.setChecked('drinking' in behavior)
+            self.smoking_status.setChecked('smoking' in behavior)
 
     def update_frame(self):
         """更新视频帧"""
-        success, frame = self.cap.read()
-        if not success:
+        # 只取最新一帧, 显示完成前采集线程不会再发送信号, 界面繁忙时旧帧直接丢弃
+        frame = self.worker.take_frame() if self.worker else None
+        if frame is None:
             return
-
-        # dlib detection
-        frame, ear, mar, fatigue = detFatigue(frame)
-        self.fatigue_status.setText(str(fatigue))
-
-        # print(fatigue_detection.EYE_CLOSED_COUNTER)
-
-        # 将帧调整为 QLabel 的大小
-        frame = cv2.resize(frame, (640, 480))  # 调整为固定大小
-        frame = cv2.flip(frame, 1)
-        show = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        showImage = QImage(show.data, show.shape[1], show.shape[0], QImage.Format_RGB888)
-        self.video_label.setPixmap(QPixmap.fromImage(showImage))
+        with self.profiler.time('resize'):
+            # 将帧调整为 QLabel 的大小, 写入预分配的缓冲区
+            cv2.resize(frame, DISPLAY_SIZE, dst=self.resized)
+        if self.result is not None and self.result.get('fatigue') is not None:
+            with self.profiler.time('draw'):
+                # dlib detection, 在缩放后的帧上绘制最近一次结果
+                gain = (DISPLAY_SIZE[0] / frame.shape[1], DISPLAY_SIZE[1] / frame.shape[0])
+                draw_fatigue(self.resized, self.result['fatigue'], gain)
+
+        with self.profiler.time('qt'):
+            if FORMAT_BGR888 is not None:
+                cv2.flip(self.resized, 1, dst=self.display)
+            else:
+                np.copyto(self.display, self.resized[:, ::-1, ::-1])  # 水平镜像与 BGR->RGB 一次完成
+            if self.profiler.enabled:
+                self.draw_latency()
+            self.video_label.setPixmap(QPixmap.fromImage(self.image))
+
+    def draw_latency(self):
+        """在画面左上角显示各阶段耗时 p50/p95/p99 (ms)"""
+        for i, (name, (p50, p95, p99)) in enumerate(self.profiler.percentiles().items()):
+            cv2.putText(self.display, f'{name}: {p50:.1f} / {p95:.1f} / {p99:.1f} ms', (10, 20 + 18 * i),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
 
     def closeEvent(self, event):
         """释放摄像头资源"""
-        if self.cap:
-            self.cap.release()
+        self.stop_camera()
         super().closeEvent(event)
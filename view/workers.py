@@ -0,0 +1,100 @@
+#!/usr/bin/env python3.8
+# -*- coding: utf-8 -*-
+
+"""
+File: workers.py
+
+Description: This module contains the background thread of the GUI. Inference (the stages of a
+pipeline.scheduler.InferenceScheduler) runs in its own QThread and hands its results to the GUI
+thread through Qt signals, so a slow frame never freezes the window. Frames come from a
+pipeline.capture.LatestFrameCapture, which keeps grabbing in the background. Display frames are
+coalesced in a one-frame slot: frame_ready is only emitted once the GUI has taken the previous
+frame, so a slow window skips frames instead of queueing them. The detector always works on the
+newest frame and the frames it skipped are counted as dropped. An AdaptiveRate paces the
+inference from its measured cost, so a slow machine lowers the detection rate instead of
+spending all its time in the detectors.
+
+Classes:
+    DetectionWorker: Runs the inference scheduler on the most recent camera frame.
+"""
+import threading
+import time
+
+from PySide2.QtCore import QThread, Signal
+
+from pipeline.adaptive import AdaptiveRate
+from pipeline.capture import LatestFrameCapture
+from pipeline.scheduler import build_scheduler
+
+
+class DetectionWorker(QThread):
+    """Reads the newest camera frame and emits a ScheduledResult per processed frame"""
+    frame_ready = Signal()                  # a frame is waiting in take_frame(), emitted from the grabbing thread
+    result_ready = Signal(object)           # ScheduledResult, small, the frame itself is not carried
+    failed = Signal(str)
+
+    def __init__(self, source=0, scheduler=None, rate=None, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.scheduler = scheduler or build_scheduler()
+        self.rate = rate or AdaptiveRate()
+        self.capture = None
+        self.running = True         # cleared by stop(), also while the models are still loading
+        self.lock = threading.Lock()
+        self.display = None         # newest frame not yet taken by the GUI
+        self.pending = False        # frame_ready emitted and not answered by take_frame() yet
+        self.display_dropped = 0    # frames replaced in the slot before the GUI took them
+
+    @property
+    def dropped(self):
+        """Frames the detector skipped because a newer one had already arrived"""
+        return self.capture.dropped if self.capture else 0
+
+    def put_frame(self, i, frame):
+        # grabbing thread: replace the waiting frame, signal the GUI only once it took the previous one
+        with self.lock:
+            self.display_dropped += self.display is not None
+            self.display = frame
+            pending, self.pending = self.pending, True
+        if not pending:
+            self.frame_ready.emit()
+
+    def take_frame(self):
+        """GUI thread: newest grabbed frame, None if it was already taken"""
+        with self.lock:
+            frame, self.display, self.pending = self.display, None, False
+        return frame
+
+    def run(self):
+        try:
+            self.scheduler.load()  # load and warm up the models here, not on the GUI thread
+        except Exception as e:
+            self.failed.emit(f"Failed to load the models: {e}")
+            return
+        if not self.running:
+            return  # stopped while loading
+        self.capture = LatestFrameCapture(self.source, on_frame=self.put_frame, profiler=self.scheduler.profiler)
+        if not self.capture.isOpened():
+            self.failed.emit("Failed to initialize the camera.")
+            return
+        while self.running:
+            success, frame = self.capture.read(timeout=0.1)
+            if not success:
+                if not self.capture.isOpened():
+                    break  # stream ended
+                continue
+            t = time.monotonic()
+            if not self.rate.due(t):
+                continue  # displayed, but not inferred
+            result = self.scheduler.process(frame, t)
+            self.rate.update(t, time.monotonic() - t)
+            self.result_ready.emit(result)
+            self.scheduler.profiler.tick()
+        self.capture.release()
+        print(f'Capture stopped: {self.capture.grabbed} frames grabbed, {self.capture.dropped} dropped, '
+              f'{self.rate.skipped} skipped, {self.display_dropped} not displayed, '
+              f'detection at {self.rate.fps:.1f} FPS')
+
+    def stop(self):
+        self.running = False
+        self.wait()